@@ -0,0 +1,118 @@
+"""
+End-to-end throughput benchmark over synthetic data.
+
+    python -m bench.run --scales 10000 100000 1000000 --out bench_report.json
+
+For each scale, the transform stages of main.run_window run in order on
+synthetic 311 and parking records. Nothing is loaded to a sink. Each stage
+reports rows in/out, wall time, rows/sec and peak traced memory. Turn off
+tracemalloc with --no-memory when only timings matter; tracing slows
+allocation-heavy stages down.
+"""
+from datetime import datetime, timezone
+from typing import Any, Callable
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import pandas as pd
+
+import main
+from bench.synthetic import generate_311, generate_parking
+from etl.core.key_mapper import assign_keys
+from etl.core.runtime import get_config
+from etl.core.utils import apply_dtype_strategy
+from etl.fact_loaders.load_311 import clean_311_data
+from etl.fact_loaders.load_parking import clean_parking_data, normalize_parking_columns
+
+
+class StageTimer:
+    def __init__(self, trace_memory: bool) -> None:
+        self.trace_memory = trace_memory
+        self.stages: list[dict[str, Any]] = []
+
+    def run(self, name: str, rows_in: int, fn: Callable[[], Any]) -> Any:
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        out = fn()
+        seconds = time.perf_counter() - started
+        peak = 0
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        rows_out = len(out) if hasattr(out, "__len__") else None
+        self.stages.append({
+            "stage": name,
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "seconds": round(seconds, 4),
+            "rows_per_sec": round(rows_in / seconds) if seconds else None,
+            "peak_mb": round(peak / 2**20, 1) if self.trace_memory else None,
+        })
+        print(f"  {name:<28} {rows_in:>10} rows  {seconds:8.3f}s")
+        return out
+
+
+def run_scale(n: int, start: datetime, end: datetime, seed: int, trace_memory: bool) -> dict[str, Any]:
+    print(f"Scale {n}: generating records…")
+    records_311 = generate_311(n, start, end, seed)
+    records_parking = generate_parking(n, start, end, seed)
+    t = StageTimer(trace_memory)
+
+    raw_311 = t.run("extract_parse_311", n, lambda: apply_dtype_strategy(pd.DataFrame.from_records(records_311)))
+    raw_parking = t.run("extract_parse_parking", n, lambda: apply_dtype_strategy(
+        normalize_parking_columns(pd.DataFrame.from_records(records_parking))
+    ))
+    del records_311, records_parking
+
+    raw_311 = t.run("normalize_strings_311", n, lambda: main.prepare_311(raw_311))
+    raw_parking = t.run("normalize_strings_parking", n, lambda: main.prepare_parking(raw_parking))
+
+    dims = {}
+    for name, (loader, src) in main.dim_sources(raw_311, raw_parking).items():
+        dims[name] = t.run(f"dim_{name}", len(src), lambda: loader.transform(loader.extract(src)))
+
+    cleaned_311 = t.run("clean_311_data", n, lambda: clean_311_data(raw_311))
+    cleaned_311["location_type"] = cleaned_311["location_type"].fillna("")
+    for key, dim, fields in [
+        ("agency_key", "agency", main.AGENCY_KEY_FIELDS),
+        ("complaint_key", "complaint", main.COMPLAINT_KEY_FIELDS),
+        ("location_key", "location", main.LOCATION_KEY_FIELDS),
+    ]:
+        cleaned_311 = t.run(f"assign_keys_{key}", len(cleaned_311), lambda: assign_keys(cleaned_311, dims[dim], fields, key))
+
+    cleaned_parking = t.run("clean_parking_data", n, lambda: clean_parking_data(raw_parking))
+    cleaned_parking.rename(columns={"plate_id": "plate", "registration_state": "state", "plate_type": "license_type"}, inplace=True)
+    t.run("assign_keys_vehicle_key", len(cleaned_parking), lambda: assign_keys(
+        cleaned_parking, dims["vehicle"], main.VEHICLE_KEY_FIELDS, "vehicle_key"
+    ))
+
+    total = sum(stage["seconds"] for stage in t.stages)
+    return {"rows": n, "total_seconds": round(total, 3), "stages": t.stages}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ETL transform stages on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000], help="Rows per source to generate")
+    parser.add_argument("--start", type=str, default="2023-01-01", help="Synthetic window start (YYYY-MM-DD)")
+    parser.add_argument("--end", type=str, default="2023-02-01", help="Synthetic window end (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc peak-memory tracking")
+    parser.add_argument("--out", type=str, default="bench_report.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d")
+    end = datetime.strptime(args.end, "%Y-%m-%d")
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "dtype_backend": get_config()["transform"]["dtype_backend"],
+        "scales": [run_scale(n, start, end, args.seed, not args.no_memory) for n in args.scales],
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
@@ -0,0 +1,173 @@
+"""
+Synthetic Socrata-shaped records for the 311 (erm2-nwe9) and FY parking
+datasets.
+
+Records look like what sodapy returns: every value is a string and null
+fields are left out of the record entirely. Value distributions are skewed
+the way the real data is (a few agencies, boroughs and states dominate,
+street names follow a Zipf curve), and parking violation_time mixes the
+formats seen in the FY tables, including unparseable ones.
+"""
+from datetime import datetime
+from typing import Any, Optional
+import numpy as np
+
+BOROUGHS = (["BROOKLYN", "QUEENS", "MANHATTAN", "BRONX", "STATEN ISLAND", "Unspecified"],
+            [0.31, 0.25, 0.2, 0.17, 0.05, 0.02])
+AGENCIES = ([("NYPD", "New York City Police Department"),
+             ("HPD", "Department of Housing Preservation and Development"),
+             ("DSNY", "Department of Sanitation"),
+             ("DOT", "Department of Transportation"),
+             ("DEP", "Department of Environmental Protection"),
+             ("DOB", "Department of Buildings"),
+             ("DPR", "Department of Parks and Recreation"),
+             ("DOHMH", "Department of Health and Mental Hygiene")],
+            [0.42, 0.22, 0.1, 0.08, 0.07, 0.05, 0.04, 0.02])
+COMPLAINTS = ([("Noise - Residential", "Loud Music/Party"),
+               ("Illegal Parking", "Blocked Hydrant"),
+               ("HEAT/HOT WATER", "ENTIRE BUILDING"),
+               ("Blocked Driveway", "No Access"),
+               ("Street Condition", "Pothole"),
+               ("Noise - Street/Sidewalk", "Loud Talking"),
+               ("Water System", "Hydrant Leaking (WC1)"),
+               ("UNSANITARY CONDITION", "PESTS")],
+              [0.24, 0.2, 0.16, 0.12, 0.1, 0.08, 0.06, 0.04])
+LOCATION_TYPES = ["RESIDENTIAL BUILDING", "Street/Sidewalk", "Residential Building/House", "Store/Commercial"]
+STATUSES = (["Closed", "Open", "In Progress", "Pending"], [0.85, 0.08, 0.05, 0.02])
+CHANNELS = ["PHONE", "ONLINE", "MOBILE", "UNKNOWN"]
+STATES = (["NY", "NJ", "PA", "CT", "FL", "99"], [0.8, 0.09, 0.04, 0.03, 0.02, 0.02])
+PLATE_TYPES = (["PAS", "COM", "OMT", "OMS", "999"], [0.72, 0.18, 0.06, 0.03, 0.01])
+MAKES = ["TOYOT", "HONDA", "FORD", "NISSA", "CHEVR", "BMW", "ME/BE", "JEEP"]
+BODY_TYPES = ["SUBN", "4DSD", "VAN", "DELV", "PICK", "SDN"]
+COLORS = ["BK", "WH", "GY", "BLACK", "WHITE", "SILVE", "BL", "RD"]
+COUNTIES = ["K", "Q", "NY", "BX", "R", "KINGS", "QN"]
+
+
+def _choice(rng: np.random.Generator, options: Any, n: int, p: Optional[list[float]] = None) -> np.ndarray:
+    idx = rng.choice(len(options), size=n, p=p)
+    return np.asarray(options, dtype=object)[idx]
+
+
+def _weighted(rng: np.random.Generator, spec: tuple[list[str], list[float]], n: int) -> np.ndarray:
+    return _choice(rng, spec[0], n, spec[1])
+
+
+def _street_names(rng: np.random.Generator, n: int, vocabulary: int = 3000) -> np.ndarray:
+    ranks = np.minimum(rng.zipf(1.3, size=n), vocabulary)
+    suffix = _choice(rng, [" STREET", " AVENUE", " AVE", " ST", " PLACE", " BLVD"], n)
+    return np.char.add(np.char.add("STREET ", ranks.astype(str)), suffix.astype(str)).astype(object)
+
+
+def _timestamps(rng: np.random.Generator, n: int, start: datetime, end: datetime) -> np.ndarray:
+    lo, hi = int(start.timestamp()), int(end.timestamp())
+    secs = rng.integers(lo, hi, size=n).astype("datetime64[s]")
+    return np.datetime_as_string(secs, unit="ms").astype(object)
+
+
+def _records(columns: dict[str, np.ndarray], null_rates: dict[str, float], rng: np.random.Generator) -> list[dict[str, Any]]:
+    n = len(next(iter(columns.values())))
+    masks = {col: rng.random(n) < rate for col, rate in null_rates.items()}
+    names = list(columns)
+    records = []
+    for i in range(n):
+        records.append({
+            col: columns[col][i] for col in names
+            if not (col in masks and masks[col][i])
+        })
+    return records
+
+
+def generate_311(n: int, start: datetime, end: datetime, seed: int = 0) -> list[dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    agency_idx = rng.choice(len(AGENCIES[0]), size=n, p=AGENCIES[1])
+    complaint_idx = rng.choice(len(COMPLAINTS[0]), size=n, p=COMPLAINTS[1])
+    created = _timestamps(rng, n, start, end)
+    closed = _timestamps(rng, n, start, end)
+    lat = rng.uniform(40.5, 40.9, n).round(8).astype(str).astype(object)
+    lon = rng.uniform(-74.25, -73.7, n).round(8).astype(str).astype(object)
+    columns = {
+        "unique_key": (np.arange(n) + 50_000_000).astype(str).astype(object),
+        "created_date": created,
+        "closed_date": closed,
+        "agency": np.asarray([a for a, _ in AGENCIES[0]], dtype=object)[agency_idx],
+        "agency_name": np.asarray([name for _, name in AGENCIES[0]], dtype=object)[agency_idx],
+        "complaint_type": np.asarray([c for c, _ in COMPLAINTS[0]], dtype=object)[complaint_idx],
+        "descriptor": np.asarray([d for _, d in COMPLAINTS[0]], dtype=object)[complaint_idx],
+        "location_type": _choice(rng, LOCATION_TYPES, n),
+        "incident_zip": rng.integers(10001, 11697, n).astype(str).astype(object),
+        "incident_address": np.char.add(rng.integers(1, 3000, n).astype(str), " ").astype(object) + _street_names(rng, n),
+        "street_name": _street_names(rng, n),
+        "cross_street_1": _street_names(rng, n),
+        "cross_street_2": _street_names(rng, n),
+        "intersection_street_1": _street_names(rng, n),
+        "intersection_street_2": _street_names(rng, n),
+        "address_type": _choice(rng, ["ADDRESS", "INTERSECTION", "BLOCKFACE"], n),
+        "city": _weighted(rng, BOROUGHS, n),
+        "borough": _weighted(rng, BOROUGHS, n),
+        "status": _weighted(rng, STATUSES, n),
+        "resolution_description": _choice(rng, ["The Police Department responded to the complaint.", "The Department of Housing Preservation and Development inspected."], n),
+        "community_board": np.char.add(rng.integers(1, 18, n).astype(str), " BROOKLYN").astype(object),
+        "open_data_channel": _choice(rng, CHANNELS, n),
+        "park_borough": _weighted(rng, BOROUGHS, n),
+        "x_coordinate": rng.integers(913000, 1067000, n).astype(str).astype(object),
+        "y_coordinate": rng.integers(121000, 272000, n).astype(str).astype(object),
+        "latitude": lat,
+        "longitude": lon,
+    }
+    null_rates = {
+        "closed_date": 0.12, "location_type": 0.15, "incident_zip": 0.02,
+        "incident_address": 0.1, "street_name": 0.1, "cross_street_1": 0.35,
+        "cross_street_2": 0.35, "intersection_street_1": 0.6,
+        "intersection_street_2": 0.6, "city": 0.05, "latitude": 0.02,
+        "longitude": 0.02, "x_coordinate": 0.02, "y_coordinate": 0.02,
+        "resolution_description": 0.05,
+    }
+    return _records(columns, null_rates, rng)
+
+
+def _violation_times(rng: np.random.Generator, n: int) -> np.ndarray:
+    hours = rng.integers(1, 13, n)
+    minutes = rng.integers(0, 60, n)
+    ampm = _choice(rng, ["A", "P"], n)
+    h2 = np.char.zfill(hours.astype(str), 2)
+    m2 = np.char.zfill(minutes.astype(str), 2)
+    formats = [
+        np.char.add(np.char.add(h2, m2), ampm.astype(str)),                      # 0853P
+        np.char.add(np.char.add(np.char.add(hours.astype(str), ":"), m2), ampm.astype(str)),  # 8:53A
+        np.char.add(np.char.add(hours.astype(str), m2), ampm.astype(str)),       # 853P
+        np.char.add(np.char.add(np.char.add(h2, m2), ampm.astype(str)), "M"),    # 0853PM (unparseable)
+        np.char.add(np.char.add("00", m2), "A"),                                 # 0053A (unparseable)
+    ]
+    which = rng.choice(len(formats), size=n, p=[0.9, 0.04, 0.03, 0.02, 0.01])
+    return np.choose(which, formats).astype(object)
+
+
+def generate_parking(n: int, start: datetime, end: datetime, seed: int = 0) -> list[dict[str, Any]]:
+    rng = np.random.default_rng(seed + 1)
+    plates = np.char.add("P", rng.zipf(1.2, n).astype(str)).astype(object)
+    columns = {
+        "summons_number": (np.arange(n) + 1_400_000_000).astype(str).astype(object),
+        "plate_id": plates,
+        "registration_state": _weighted(rng, STATES, n),
+        "plate_type": _weighted(rng, PLATE_TYPES, n),
+        "issue_date": _timestamps(rng, n, start, end),
+        "violation_code": np.minimum(rng.zipf(1.6, n), 99).astype(str).astype(object),
+        "vehicle_body_type": _choice(rng, BODY_TYPES, n),
+        "vehicle_make": _choice(rng, MAKES, n),
+        "vehicle_year": rng.integers(1990, 2025, n).astype(str).astype(object),
+        "vehicle_color": _choice(rng, COLORS, n),
+        "unregistered_vehicle": _choice(rng, ["Yes", "No"], n, p=[0.02, 0.98]),
+        "violation_time": _violation_times(rng, n),
+        "house_number": rng.integers(1, 3000, n).astype(str).astype(object),
+        "street_name": _street_names(rng, n),
+        "intersecting_street": _street_names(rng, n),
+        "violation_county": _choice(rng, COUNTIES, n),
+        "violation_precinct": rng.integers(1, 124, n).astype(str).astype(object),
+        "issuing_agency": _choice(rng, ["P", "T", "S", "K"], n),
+    }
+    null_rates = {
+        "vehicle_body_type": 0.01, "vehicle_make": 0.01, "vehicle_color": 0.05,
+        "unregistered_vehicle": 0.8, "violation_time": 0.005,
+        "house_number": 0.15, "intersecting_street": 0.55, "violation_county": 0.01,
+    }
+    return _records(columns, null_rates, rng)
@@ -5,6 +5,8 @@ from pathlib import Path
 class BQConfig(TypedDict):
     project_id: str
     dataset: str
+    pool_size: int
+    load_concurrency: int
 
 class TableConfig(TypedDict):
     agency_dim: str
@@ -18,9 +20,86 @@ class TableConfig(TypedDict):
     vehicle_dim: str
     violation_dim: str
 
+class SocrataConfig(TypedDict):
+    page_size: int
+    concurrency: int
+    min_concurrency: int
+    max_concurrency: int
+    timeout_seconds: int
+    max_retries: int
+    backoff_base_seconds: float
+    backoff_max_seconds: float
+    transport: str
+    csv_request_rows: int
+
+class ParkingConfig(TypedDict):
+    fy_spillover: int
+
+class StateConfig(TypedDict):
+    dir: str
+
+class BackfillConfig(TypedDict):
+    start: str
+    workers: int
+    shard_max_rows: int
+    shard_min_days: int
+    commit_every: int
+
+class CacheConfig(TypedDict):
+    enabled: bool
+    dir: str
+    max_bytes: int
+    recent_days: int
+    recent_ttl_hours: int
+
+class TransformConfig(TypedDict):
+    dtype_backend: str
+    categorical_columns: list[str]
+    engine: str
+    workers: int
+    parallel_min_rows: int
+
+class SpillConfig(TypedDict):
+    dir: str
+    chunk_rows: int
+    batch_rows: int
+    memory_limit: str
+
+class FactPartitionsConfig(TypedDict):
+    enabled: bool
+
+class SinkConfig(TypedDict):
+    backend: str
+    path: str
+    partition_columns: dict[str, list[str]]
+
+class MetricsConfig(TypedDict):
+    format: str
+    dir: str
+    trace_memory: bool
+
+class IncrementalConfig(TypedDict):
+    lookback_minutes: int
+
+class SchemaConfig(TypedDict):
+    version: int
+    columns: dict[str, str]
+
 class Config(TypedDict):
     bigquery: BQConfig
     tables: dict[str, str]
+    socrata: SocrataConfig
+    parking: ParkingConfig
+    state: StateConfig
+    backfill: BackfillConfig
+    cache: CacheConfig
+    transform: TransformConfig
+    spill: SpillConfig
+    fact_partitions: FactPartitionsConfig
+    sink: SinkConfig
+    metrics: MetricsConfig
+    incremental: IncrementalConfig
+    schemas: dict[str, SchemaConfig]
 
 def load_config() -> Config:
     with open(Path(__file__).parent / "settings.toml", "rb") as f:
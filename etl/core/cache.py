@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from etl.core.runtime import get_config
+from etl.core.state import ROOT_DIR
+
+OFFLINE_ENV = "ETL_OFFLINE"
+MARKER = "_SUCCESS"
+# Parquet metadata key listing a part's JSON-encoded nested columns
+JSON_COLUMNS_KEY = b"etl.json_columns"
+# bumped when the part format changes, so older entries are not read
+FORMAT_VERSION = 2
+# entries read or written more recently than this are never evicted
+EVICT_MIN_IDLE = timedelta(hours=1)
+
+
+def set_offline(offline: bool = True) -> None:
+    # an env var rather than a module flag so backfill workers inherit it
+    os.environ[OFFLINE_ENV] = "1" if offline else ""
+
+
+def is_offline() -> bool:
+    return bool(os.environ.get(OFFLINE_ENV))
+
+
+def arrow_to_frame(table: pa.Table | pa.RecordBatch) -> pd.DataFrame:
+    """Arrow data as the frame from_records would have built, NaN for missing values."""
+    df = table.to_pandas()
+    return df.where(df.notna(), np.nan)
+
+
+def _jsonify_nested(df: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    # Socrata returns some columns (e.g. 311 `location`) as nested objects,
+    # which do not round-trip through Parquet reliably; store them as JSON.
+    # Every value of such a column is encoded, so _decode_nested can tell
+    # them apart from plain strings.
+    encoded = []
+    for col in df.columns[df.dtypes == object]:
+        if df[col].map(lambda v: isinstance(v, (dict, list))).any():
+            df[col] = df[col].map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) or not pd.isna(v) else v)
+            encoded.append(col)
+    return df, encoded
+
+
+def _decode_nested(df: pd.DataFrame, encoded: list[str]) -> pd.DataFrame:
+    # a cache hit hands back the same dicts and lists as a fresh fetch
+    for col in encoded:
+        if col in df.columns:
+            df[col] = df[col].map(lambda v: json.loads(v) if isinstance(v, str) else v)
+    return df
+
+
+class ExtractCache:
+    """
+    Content-addressed Parquet cache of raw Socrata extracts.
+
+    Each entry is a directory of part files named by a hash of the dataset,
+    window, projection and row limit, completed by a marker file. Entries are
+    evicted least-recently-used once the cache exceeds max_bytes, and windows
+    that end within recent_days of now expire after recent_ttl_hours since the
+    source may still be updating them.
+    """
+
+    def __init__(self) -> None:
+        cfg = get_config()["cache"]
+        self.root = ROOT_DIR / cfg["dir"]
+        self.enabled = cfg["enabled"]
+        self.max_bytes = cfg["max_bytes"]
+        self.recent = timedelta(days=cfg["recent_days"])
+        self.recent_ttl = timedelta(hours=cfg["recent_ttl_hours"])
+
+    @staticmethod
+    def key(resource: str, start: str, end: str, select: Optional[str] = None, limit: Optional[int] = None) -> str:
+        raw = json.dumps([resource, start, end, select or "*", limit, FORMAT_VERSION])
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _is_fresh(self, entry: Path, end: str) -> bool:
+        window_end = datetime.fromisoformat(end[:19])
+        if datetime.now() - window_end > self.recent:
+            return True
+        written = datetime.fromtimestamp(json.loads((entry / MARKER).read_text())["written_at"])
+        return datetime.now() - written < self.recent_ttl
+
+    def frames(
+        self,
+        resource: str,
+        start: str,
+        end: str,
+        fetch: Callable[[], Iterator[pd.DataFrame]],
+        select: Optional[str] = None,
+        limit: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yield the extract from cache when possible, otherwise fetch and cache it.
+
+        select is a comma-separated column list; an all-columns entry for the
+        same window also satisfies it.
+        """
+        if not self.enabled and not is_offline():
+            yield from fetch()
+            return
+
+        entry = self.root / self.key(resource, start, end, select, limit)
+        candidates: list[tuple[Path, Optional[list[str]]]] = [(entry, None)]
+        if select:
+            full = self.root / self.key(resource, start, end, None, limit)
+            candidates.append((full, [c.strip() for c in select.split(",")]))
+        for cached, columns in candidates:
+            if (cached / MARKER).exists() and (is_offline() or self._is_fresh(cached, end)):
+                print(f"Reading {resource} {start}–{end} from cache")
+                os.utime(cached / MARKER)
+                yield from self._read(cached, chunk_size, columns)
+                return
+        if is_offline():
+            raise RuntimeError(f"{resource} {start}–{end} is not cached and offline mode is on")
+
+        yield from self._fetch_and_write(entry, fetch)
+        self._evict(keep=entry)
+
+    def _read(self, entry: Path, chunk_size: Optional[int], columns: Optional[list[str]] = None) -> Iterator[pd.DataFrame]:
+        for part in sorted(entry.glob("part-*.parquet")):
+            # marks the entry as in use, so _evict leaves it to this reader
+            os.utime(entry / MARKER)
+            pf = pq.ParquetFile(part)
+            names = [c for c in columns if c in pf.schema_arrow.names] if columns else None
+            encoded = json.loads((pf.schema_arrow.metadata or {}).get(JSON_COLUMNS_KEY, b"[]"))
+            if chunk_size:
+                for batch in pf.iter_batches(batch_size=chunk_size, columns=names):
+                    yield _decode_nested(arrow_to_frame(batch), encoded)
+            else:
+                yield _decode_nested(arrow_to_frame(pf.read(columns=names)), encoded)
+
+    def _fetch_and_write(self, entry: Path, fetch: Callable[[], Iterator[pd.DataFrame]]) -> Iterator[pd.DataFrame]:
+        tmp = entry.with_name(f"{entry.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        try:
+            rows = 0
+            for i, df in enumerate(fetch()):
+                plain, encoded = _jsonify_nested(df.copy())
+                table = pa.Table.from_pandas(plain, preserve_index=False)
+                metadata = {**(table.schema.metadata or {}), JSON_COLUMNS_KEY: json.dumps(encoded).encode()}
+                pq.write_table(table.replace_schema_metadata(metadata), tmp / f"part-{i:05d}.parquet")
+                rows += len(df)
+                yield df
+            (tmp / MARKER).write_text(json.dumps({"written_at": time.time(), "rows": rows}))
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _evict(self, keep: Path) -> None:
+        entries = []
+        for marker in self.root.glob(f"*/{MARKER}"):
+            size = sum(f.stat().st_size for f in marker.parent.iterdir())
+            entries.append((marker.stat().st_mtime, size, marker.parent))
+        total = sum(size for _, size, _ in entries)
+        in_use = time.time() - EVICT_MIN_IDLE.total_seconds()
+        for used_at, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # another backfill process may still be reading a recent entry
+            if path != keep and used_at < in_use:
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
@@ -1,8 +1,10 @@
 from abc import ABC
-from typing import Protocol
+from typing import Optional, Protocol
 import pandas as pd
-from google.cloud import bigquery
-from config import load_config
+from etl.core.key_registry import KeyRegistry
+from etl.core.metrics import stage
+from etl.core.sinks import get_sink
+from etl.core.utils import to_plain_dtypes
 
 
 class DimLoaderProtocol(Protocol):
@@ -12,19 +14,43 @@ class DimLoaderProtocol(Protocol):
 
 
 class BaseDimLoader(ABC):
+    # Loaders that set key_column only upload members whose key has never
+    # been loaded before, as recorded in the local KeyRegistry.
+    key_column: Optional[str] = None
+    # Raw source columns extract() reads; main.py requests only these (plus
+    # what the facts need) from Socrata.
+    source_columns: list[str] = []
+
     def __init__(self, table_key: str) -> None:
-        cfg = load_config()
-        project = cfg["bigquery"]["project_id"]
-        dataset = cfg["bigquery"]["dataset"]
-        tables = cfg["tables"]
-        self.table_id = f"{project}.{dataset}.{tables[table_key]}"
-        self.client = bigquery.Client()
-
-    def load(self, df: pd.DataFrame) -> None:
+        self.table_key = table_key
+        self.table_id = get_sink().target(table_key)
+
+    def extract(self, df: pd.DataFrame) -> pd.DataFrame:
+        """The columns of a raw frame this dimension is built from."""
+        raise NotImplementedError
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Dimension rows, with their key, for the output of extract()."""
+        raise NotImplementedError
+
+    def load(self, df: pd.DataFrame, write_disposition: str = "WRITE_APPEND") -> None:
+        """Write df to the configured sink; the caller flushes the sink."""
         if df.empty:
             print(f"No data to load into {self.table_id}")
             return
 
-        job = self.client.load_table_from_dataframe(df, self.table_id, job_config=bigquery.LoadJobConfig(write_disposition="WRITE_APPEND"))
-        job.result()
-        print(f"Loaded {df.shape[0]} rows into {self.table_id}")
+        with stage("dim_load", rows_in=len(df), table=self.table_key) as s:
+            on_error = None
+            if self.key_column:
+                registry = KeyRegistry()
+                df = df.drop_duplicates(subset=[self.key_column])
+                new_keys = registry.claim(self.table_id, df[self.key_column])
+                df = df[df[self.key_column].isin(new_keys)]
+                s.rows_out = len(df)
+                if df.empty:
+                    print(f"No new members for {self.table_id}")
+                    return
+                on_error = lambda: registry.release(self.table_id, new_keys)
+
+            s.rows_out = len(df)
+            get_sink().write(self.table_key, to_plain_dtypes(df), write_disposition, on_error)
@@ -1,14 +1,24 @@
+from typing import Optional
 import pandas as pd
-from etl.core.utils import hash_key
+from etl.core.metrics import stage
+from etl.core.utils import hash_columns
 
 
 def assign_keys(
     fact_df: pd.DataFrame,
-    dim_df: pd.DataFrame,
+    dim_df: Optional[pd.DataFrame],
     dim_fields: list[str],
     key_name: str
 ) -> pd.DataFrame:
-    if dim_df.empty or not all(field in dim_df.columns for field in dim_fields):
+    """Stamp key_name onto fact_df and drop the natural-key fields.
+
+    Keys are a deterministic hash of the natural-key columns, so they are
+    computed directly on the fact frame; the dim only decides which keys
+    exist (rows with no matching dim member get NA, as with a left join).
+    With dim_df=None every key is kept and the caller checks membership
+    itself. fact_df is modified in place and returned.
+    """
+    if dim_df is not None and (dim_df.empty or not all(field in dim_df.columns for field in dim_fields)):
         print(f"Skipping key assignment for {key_name} — missing fields or empty dim_df.")
         fact_df[key_name] = pd.NA
         return fact_df
@@ -18,32 +28,14 @@ def assign_keys(
         fact_df[key_name] = pd.NA
         return fact_df
 
-    dim_df = dim_df.copy()
-    fact_df = fact_df.copy()
-
-    dim_df[key_name] = dim_df.apply(lambda row: hash_key(row, dim_fields), axis=1)
-
-    # Defensive join key generation
-    try:
-        dim_df["__join_key__"] = dim_df[dim_fields].astype(str).agg("|".join, axis=1)
-        fact_df["__join_key__"] = fact_df[dim_fields].astype(str).agg("|".join, axis=1)
-    except Exception as e:
-        print(f"Failed to generate join keys for {key_name}: {e}")
-        fact_df[key_name] = pd.NA
-        return fact_df
-
-    # Drop join fields from dim_df to avoid column collisions
-    dim_df = dim_df.drop(columns=[f for f in dim_fields if f in dim_df.columns], errors="ignore")
-    
-    joined = fact_df.merge(dim_df[[key_name, "__join_key__"]], on="__join_key__", how="left")
-
-    # Clean up only if the column exists
-    if "__join_key__" in joined.columns:
-        joined = joined.drop(columns=["__join_key__"], errors="ignore")
-
-    # Also drop original dimension fields if still present
-    for field in dim_fields:
-        if field in joined.columns:
-            joined = joined.drop(columns=field)
-
-    return joined
+    with stage("assign_keys", rows_in=len(fact_df), key=key_name) as s:
+        fact_keys = hash_columns(fact_df, dim_fields)
+        if dim_df is None:
+            fact_df[key_name] = fact_keys
+        else:
+            dim_keys = hash_columns(dim_df, dim_fields)
+            fact_df[key_name] = fact_keys.where(fact_keys.isin(dim_keys.unique()))
+        s.rows_out = int(fact_df[key_name].notna().sum())
+
+    fact_df.drop(columns=dim_fields, inplace=True)
+    return fact_df
@@ -0,0 +1,68 @@
+import sqlite3
+from pathlib import Path
+from typing import Optional
+import pandas as pd
+from etl.core.state import state_dir
+
+
+class KeyRegistry:
+    """
+    SQLite-backed record of which keys each dimension table already holds.
+
+    Keys are claimed before a load and released again if the load fails, so
+    concurrent backfill workers never upload the same member twice.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or state_dir() / "key_registry.sqlite"
+        conn = self._connect()
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dim_keys ("
+                " dim TEXT NOT NULL, key INTEGER NOT NULL, PRIMARY KEY (dim, key)"
+                ") WITHOUT ROWID"
+            )
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60)
+
+    def claim(self, dim: str, keys: pd.Series) -> set[int]:
+        """Record keys for dim and return the ones that were not there before."""
+        incoming = [(int(k),) for k in keys.dropna().unique()]
+        conn = self._connect()
+        conn.isolation_level = None
+        try:
+            # IMMEDIATE takes the write lock up front, so the check and the
+            # insert below cannot interleave with another worker's claim
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (key INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM incoming")
+            conn.executemany("INSERT OR IGNORE INTO incoming (key) VALUES (?)", incoming)
+            new_keys = {
+                key for (key,) in conn.execute(
+                    "SELECT key FROM incoming WHERE key NOT IN"
+                    " (SELECT key FROM dim_keys WHERE dim = ?)",
+                    (dim,),
+                )
+            }
+            conn.executemany(
+                "INSERT INTO dim_keys (dim, key) VALUES (?, ?)", [(dim, k) for k in new_keys]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return new_keys
+
+    def release(self, dim: str, keys: set[int]) -> None:
+        """Forget keys whose load did not go through."""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "DELETE FROM dim_keys WHERE dim = ? AND key = ?", [(dim, k) for k in keys]
+            )
+        conn.close()
@@ -0,0 +1,242 @@
+"""
+Per-stage timing and memory metrics.
+
+Wrap a unit of work in `stage()` to record its wall time, CPU time, rows in
+and out and the process's peak RSS. Records go out as JSON lines, or as a
+Prometheus textfile written by `flush()`, depending on [metrics].format.
+With [metrics].trace_memory, tracemalloc also reports each stage's peak
+Python allocation. `set_profiling()` dumps one cProfile file per stage
+execution; nested stages are profiled separately from their parents.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Sized, TypeVar
+import cProfile
+import functools
+import json
+import os
+import re
+import resource
+import threading
+import time
+import tracemalloc
+
+from etl.core.runtime import get_config
+from etl.core.state import ROOT_DIR
+
+T = TypeVar("T", bound=Sized)
+F = TypeVar("F", bound=Callable[..., Any])
+
+_lock = threading.Lock()
+_local = threading.local()
+_records: list[dict[str, Any]] = []
+_profile_dir: Optional[Path] = None
+_profile_seq = 0
+
+
+class Stage:
+    """What a stage() block reports; set rows_out (and labels) inside the block."""
+
+    def __init__(self, name: str, rows_in: Optional[int], labels: dict[str, str]) -> None:
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.labels = labels
+        self.tracemalloc_peak = 0
+        self.profiler: Optional[cProfile.Profile] = None
+
+
+def metrics_dir() -> Path:
+    path = ROOT_DIR / get_config()["metrics"]["dir"]
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def set_profiling(enabled: bool = True) -> None:
+    """Dump a cProfile per stage under <metrics dir>/profiles."""
+    global _profile_dir
+    _profile_dir = metrics_dir() / "profiles" if enabled else None
+    if _profile_dir:
+        _profile_dir.mkdir(parents=True, exist_ok=True)
+
+
+def _stack() -> list[Stage]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _dump_profile(current: Stage) -> None:
+    global _profile_seq
+    assert current.profiler and _profile_dir
+    with _lock:
+        _profile_seq += 1
+        seq = _profile_seq
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", current.name)
+    current.profiler.dump_stats(_profile_dir / f"{os.getpid()}-{seq:04d}-{safe}.prof")
+
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None, **labels: str) -> Iterator[Stage]:
+    """Measure the enclosed block as one stage named name."""
+    cfg = get_config()["metrics"]
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    current = Stage(name, rows_in, labels)
+
+    trace = cfg["trace_memory"]
+    if trace:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif parent:
+            parent.tracemalloc_peak = max(parent.tracemalloc_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    if _profile_dir:
+        if parent and parent.profiler:
+            parent.profiler.disable()
+        current.profiler = cProfile.Profile()
+        current.profiler.enable()
+
+    stack.append(current)
+    started, cpu_started = time.perf_counter(), time.process_time()
+    try:
+        yield current
+    finally:
+        wall = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        stack.pop()
+        if current.profiler:
+            current.profiler.disable()
+            _dump_profile(current)
+            if parent and parent.profiler:
+                parent.profiler.enable()
+        if trace:
+            current.tracemalloc_peak = max(current.tracemalloc_peak, tracemalloc.get_traced_memory()[1])
+            if parent:
+                parent.tracemalloc_peak = max(parent.tracemalloc_peak, current.tracemalloc_peak)
+
+        _record({
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "pid": os.getpid(),
+            "stage": name,
+            **current.labels,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "rows_in": current.rows_in,
+            "rows_out": current.rows_out,
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "tracemalloc_peak_bytes": current.tracemalloc_peak if trace else None,
+        })
+
+
+def iter_stage(name: str, frames: Iterator[T], **labels: str) -> Iterator[T]:
+    """Yield from frames, recording the time spent producing each item as a stage."""
+    while True:
+        with stage(name, None, **labels) as s:
+            item = next(frames, None)
+            if item is not None:
+                s.rows_out = len(item)
+        if item is None:
+            return
+        yield item
+
+
+def timed(name: str, **labels: str) -> Callable[[F], F]:
+    """Decorate a function taking a DataFrame first; rows in/out come from len()."""
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(df: Any, *args: Any, **kwargs: Any) -> Any:
+            with stage(name, rows_in=len(df), **labels) as s:
+                out = fn(df, *args, **kwargs)
+                if out is not None:
+                    s.rows_out = len(out)
+            return out
+        return wrapper  # type: ignore[return-value]
+    return decorate
+
+
+def _record(record: dict[str, Any]) -> None:
+    fmt = get_config()["metrics"]["format"]
+    if fmt == "off":
+        return
+    with _lock:
+        if fmt == "jsonl":
+            with open(metrics_dir() / "metrics.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        else:
+            _records.append(record)
+
+
+def _prom_labels(labels: dict[str, Any]) -> str:
+    inner = ",".join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in labels.items())
+    return "{" + inner + "}"
+
+
+def flush() -> None:
+    """
+    Write the Prometheus textfile for the stages recorded so far.
+
+    Stages that ran more than once (per chunk, per dimension) are summed.
+    The file is replaced atomically so a node_exporter textfile collector
+    never reads it half-written; JSON lines need no flush.
+    """
+    if get_config()["metrics"]["format"] != "prometheus":
+        return
+    with _lock:
+        records, _records[:] = list(_records), []
+    if not records:
+        return
+
+    totals: dict[tuple[tuple[str, Any], ...], dict[str, float]] = {}
+    peak_rss = 0
+    for r in records:
+        key = tuple((k, v) for k, v in r.items() if k not in _VALUE_FIELDS)
+        agg = totals.setdefault(key, {"runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows_in": 0, "rows_out": 0})
+        agg["runs"] += 1
+        agg["wall_seconds"] += r["wall_seconds"]
+        agg["cpu_seconds"] += r["cpu_seconds"]
+        agg["rows_in"] += r["rows_in"] or 0
+        agg["rows_out"] += r["rows_out"] or 0
+        if r["tracemalloc_peak_bytes"] is not None:
+            agg["tracemalloc_peak_bytes"] = max(agg.get("tracemalloc_peak_bytes", 0), r["tracemalloc_peak_bytes"])
+        peak_rss = max(peak_rss, r["peak_rss_bytes"])
+
+    lines = []
+    for metric, help_text in _PROM_METRICS.items():
+        lines.append(f"# HELP etl_stage_{metric} {help_text}")
+        lines.append(f"# TYPE etl_stage_{metric} gauge")
+        for key, agg in totals.items():
+            if metric in agg:
+                lines.append(f"etl_stage_{metric}{_prom_labels(dict(key))} {agg[metric]}")
+    lines.append("# HELP etl_peak_rss_bytes Peak resident set size of the ETL process")
+    lines.append("# TYPE etl_peak_rss_bytes gauge")
+    lines.append(f"etl_peak_rss_bytes {peak_rss}")
+    lines.append("# HELP etl_last_run_timestamp_seconds When these metrics were written")
+    lines.append("# TYPE etl_last_run_timestamp_seconds gauge")
+    lines.append(f"etl_last_run_timestamp_seconds {time.time():.0f}")
+
+    path = metrics_dir() / "etl.prom"
+    tmp = path.with_suffix(f".prom.{os.getpid()}.tmp")
+    tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+_VALUE_FIELDS = {
+    "ts", "pid", "wall_seconds", "cpu_seconds", "rows_in", "rows_out",
+    "peak_rss_bytes", "tracemalloc_peak_bytes",
+}
+_PROM_METRICS = {
+    "runs": "Times the stage ran in the last ETL run",
+    "wall_seconds": "Wall-clock seconds spent in the stage",
+    "cpu_seconds": "Process CPU seconds spent in the stage",
+    "rows_in": "Rows the stage received",
+    "rows_out": "Rows the stage produced",
+    "tracemalloc_peak_bytes": "Peak traced Python allocation during the stage",
+}
@@ -0,0 +1,103 @@
+"""
+Row-sharded transforms on a process pool.
+
+map_shards() splits frames into contiguous row shards and runs a function
+on each in a worker process. Shards and results travel as Arrow IPC files
+in shared memory (/dev/shm where it exists) that the other side memory-maps,
+rather than being pickled through the pool's pipes.
+"""
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+ShardFn = Callable[..., dict[str, pd.DataFrame]]
+# a frame in flight: its IPC file and the dtypes to restore on the other side
+Shipped = tuple[str, dict[str, Any]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_transform_pool(workers: int) -> ProcessPoolExecutor:
+    """One pool per process, created on first use and kept for later windows."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _shared_dir() -> str:
+    shm = Path("/dev/shm")
+    return str(shm) if shm.is_dir() else tempfile.gettempdir()
+
+
+def _ship(df: pd.DataFrame, path: Path) -> Shipped:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return str(path), dict(df.dtypes)
+
+
+def _receive(shipped: Shipped) -> pd.DataFrame:
+    path, dtypes = shipped
+    with pa.memory_map(path) as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    # Arrow brings object columns back with None for nulls and may pick other
+    # extension dtypes; hash_columns tells None from NaN, so put back exactly
+    # what was sent
+    for col, dtype in dtypes.items():
+        s = df[col]
+        if dtype == object:
+            df[col] = s.astype(object).where(s.notna(), np.nan)
+        elif s.dtype != dtype:
+            df[col] = s.astype(dtype)
+    return df
+
+
+def _run_shard(fn: ShardFn, inputs: dict[str, Shipped], out_dir: str) -> dict[str, Shipped]:
+    frames = {name: _receive(shipped) for name, shipped in inputs.items()}
+    return {
+        name: _ship(df, Path(out_dir) / f"out-{name}.arrow")
+        for name, df in fn(**frames).items()
+    }
+
+
+def map_shards(fn: ShardFn, frames: dict[str, pd.DataFrame], workers: int) -> list[dict[str, pd.DataFrame]]:
+    """
+    fn(**shard) for `workers` row shards of frames, in shard order.
+
+    Shard i holds the same slice position of every frame, and earlier shards
+    get the extra rows, so shard 0 is non-empty for every non-empty frame.
+    fn must be importable by name (a module-level function) and return a
+    dict of frames.
+    """
+    pool = get_transform_pool(workers)
+    tmp = Path(tempfile.mkdtemp(prefix="etl-shards-", dir=_shared_dir()))
+    try:
+        futures = []
+        for i in range(workers):
+            shard_dir = tmp / f"{i:04d}"
+            shard_dir.mkdir()
+            inputs = {}
+            for name, df in frames.items():
+                lo, hi = -(-len(df) * i // workers), -(-len(df) * (i + 1) // workers)
+                inputs[name] = _ship(df.iloc[lo:hi], shard_dir / f"in-{name}.arrow")
+            futures.append(pool.submit(_run_shard, fn, inputs, str(shard_dir)))
+        return [
+            {name: _receive(shipped) for name, shipped in future.result().items()}
+            for future in futures
+        ]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,235 @@
+import shutil
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from etl.core.metrics import stage
+from etl.core.runtime import get_config
+from etl.core.schemas import table_schema
+from etl.core.sinks import get_sink
+from etl.core.state import ROOT_DIR, state_dir
+
+_writer: Optional["FactPartitionWriter"] = None
+_writer_lock = threading.Lock()
+# staging directory of rows without a day
+UNDATED = "undated"
+
+# one pandas dtype per Arrow type, whether or not a chunk has nulls, so a
+# day hashes the same however its rows were split into loads
+_HASH_DTYPES = {
+    pa.int64(): pd.Int64Dtype(),
+    pa.float64(): pd.Float64Dtype(),
+    pa.bool_(): pd.BooleanDtype(),
+    pa.string(): pd.StringDtype(),
+}
+
+
+class PartitionManifest:
+    """
+    SQLite record of the fact partitions (table, day) loaded so far, with
+    the row count and content hash of each.
+
+    Like the KeyRegistry it is safe to share between backfill workers.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path or state_dir() / "fact_partitions.sqlite"
+        conn = self._connect()
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS partitions ("
+                " tbl TEXT NOT NULL, day INTEGER NOT NULL, hash TEXT NOT NULL,"
+                " rows INTEGER NOT NULL, window TEXT, loaded_at TEXT,"
+                " PRIMARY KEY (tbl, day)"
+                ") WITHOUT ROWID"
+            )
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60)
+
+    def get(self, table: str, days: list[int]) -> dict[int, tuple[str, int]]:
+        """(hash, rows) for each of days that has been loaded into table."""
+        conn = self._connect()
+        try:
+            found = {}
+            for i in range(0, len(days), 500):
+                batch = days[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT day, hash, rows FROM partitions WHERE tbl = ? AND day IN ({', '.join('?' * len(batch))})",
+                    (table, *batch),
+                )
+                found.update({day: (h, n) for day, h, n in rows})
+            return found
+        finally:
+            conn.close()
+
+    def record(self, table: str, entries: dict[int, tuple[str, int]], window: str) -> None:
+        loaded_at = datetime.now(timezone.utc).isoformat()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO partitions (tbl, day, hash, rows, window, loaded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(table, day, h, n, window, loaded_at) for day, (h, n) in entries.items()],
+            )
+        conn.close()
+
+
+def _row_hashes(table_key: str, df: pd.DataFrame) -> np.ndarray:
+    schema = table_schema(table_key)
+    if schema is not None:
+        df = schema.conform(df).to_pandas(types_mapper=_HASH_DTYPES.get)
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _full_days(start: str, end: str) -> tuple[int, int]:
+    """First and last YYYYMMDD day lying wholly inside [start, end)."""
+    lo, hi = pd.Timestamp(start.rstrip("Z")), pd.Timestamp(end.rstrip("Z"))
+    first = lo.normalize() + pd.Timedelta(days=0 if lo == lo.normalize() else 1)
+    last = hi.normalize() - pd.Timedelta(days=1)
+    return int(first.strftime("%Y%m%d")), int(last.strftime("%Y%m%d"))
+
+
+class FactPartitionWriter:
+    """
+    Loads the fact rows of one run (one main() window) so that rerunning a
+    window, or overlapping it with another, does not duplicate rows.
+
+    write() only stages rows on local disk, grouped by day. finish() then
+    takes each day once, complete: rows repeating the table's key are
+    dropped, and the day's row count and content hash are compared with the
+    manifest. A day never loaded is appended, an unchanged one is skipped,
+    and a changed one is replaced atomically (Sink.replace), so every day
+    gets exactly one load. Days the window only partly covers, and rows
+    without a day, are merged on the key instead. record() saves the
+    outcome once the sink has flushed.
+
+    Days loaded before the manifest existed are unknown to it, so the first
+    rerun over them still appends.
+    """
+
+    def __init__(self, start: str, end: str) -> None:
+        self.window = f"{start}/{end}"
+        self.first_day, self.last_day = _full_days(start, end)
+        self.manifest = PartitionManifest()
+        self.path = ROOT_DIR / get_config()["spill"]["dir"] / f"partitions-{uuid.uuid4().hex}"
+        self._columns: dict[str, tuple[str, str]] = {}
+        self._parts = 0
+        self._loaded: dict[str, dict[int, tuple[str, int]]] = {}
+
+    def write(self, table_key: str, df: pd.DataFrame, key_column: str, day_column: str) -> None:
+        """Stage df's rows; nothing reaches the sink before finish()."""
+        if df.empty:
+            return
+        self._columns[table_key] = (key_column, day_column)
+        schema = table_schema(table_key)
+        table = schema.conform(df) if schema else pa.Table.from_pandas(df, preserve_index=False)
+        days = df[day_column].astype("Int64").fillna(0).to_numpy(dtype="int64")
+        for day, idx in pd.Series(days).groupby(days).indices.items():
+            day_dir = self.path / table_key / (str(day) if day else UNDATED)
+            day_dir.mkdir(parents=True, exist_ok=True)
+            pq.write_table(table.take(idx), day_dir / f"part-{self._parts:06d}.parquet")
+            self._parts += 1
+
+    def _read_day(self, day_dir: Path, key_column: str) -> pd.DataFrame:
+        table = pa.concat_tables([pq.read_table(part) for part in sorted(day_dir.glob("part-*.parquet"))])
+        df = table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+        return df.drop_duplicates(subset=[key_column]).reset_index(drop=True)
+
+    def finish(self) -> None:
+        """Load the staged rows of every table, day by day."""
+        sink = get_sink()
+        batch_rows = get_config()["spill"]["batch_rows"]
+        for table_key, (key_column, day_column) in self._columns.items():
+            target = sink.target(table_key)
+            day_dirs = sorted((self.path / table_key).iterdir())
+            full = [int(d.name) for d in day_dirs if d.name != UNDATED and self.first_day <= int(d.name) <= self.last_day]
+            previous = self.manifest.get(table_key, full)
+            loaded = self._loaded.setdefault(table_key, {})
+            pending: dict[str, list[pd.DataFrame]] = {"append": [], "replace": [], "merge": []}
+            counts = dict.fromkeys(["skip", *pending], 0)
+
+            def load(kind: str, force: bool = False) -> None:
+                frames = pending[kind]
+                if not frames or (not force and sum(map(len, frames)) < batch_rows):
+                    return
+                df = pd.concat(frames, ignore_index=True)
+                pending[kind] = []
+                if kind == "append":
+                    sink.write(table_key, df)
+                elif kind == "merge":
+                    sink.merge(table_key, df, [key_column])
+                else:
+                    days = sorted(int(d) for d in df[day_column].unique())
+                    sink.replace(table_key, df, day_column, days)
+
+            for day_dir in day_dirs:
+                df = self._read_day(day_dir, key_column)
+                if day_dir.name == UNDATED or int(day_dir.name) not in full:
+                    kind = "merge"
+                else:
+                    day = int(day_dir.name)
+                    loaded[day] = (f"{int(_row_hashes(table_key, df).sum(dtype=np.uint64)):016x}", len(df))
+                    kind = "append" if day not in previous else "skip" if previous[day] == loaded[day] else "replace"
+                counts[kind] += 1
+                if kind != "skip":
+                    pending[kind].append(df)
+                    load(kind)
+            for kind in pending:
+                load(kind, force=True)
+
+            if counts["skip"]:
+                print(f"Skipping {counts['skip']} unchanged partitions of {target}")
+            if counts["replace"]:
+                print(f"Replacing {counts['replace']} changed partitions of {target}")
+            if counts["merge"]:
+                print(f"Merging {counts['merge']} partial or undated partitions of {target} on {key_column}")
+
+    def record(self) -> None:
+        """Save the days finish() loaded or skipped; call after the sink has flushed."""
+        for table_key, days in self._loaded.items():
+            self.manifest.record(table_key, days, self.window)
+
+    def close(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def get_partition_writer() -> Optional[FactPartitionWriter]:
+    """The writer of the partition_run() in progress, if any."""
+    with _writer_lock:
+        return _writer
+
+
+@contextmanager
+def partition_run(start: str, end: str) -> Iterator[Optional[FactPartitionWriter]]:
+    """
+    Stage the fact rows written inside the block and, once it completes,
+    load them through a FactPartitionWriter and record what was loaded.
+    With [fact_partitions].enabled off, facts go straight to the sink.
+    """
+    global _writer
+    if not get_config()["fact_partitions"]["enabled"]:
+        yield None
+        return
+    writer = FactPartitionWriter(start, end)
+    with _writer_lock:
+        _writer = writer
+    try:
+        yield writer
+        with stage("fact_partitions"):
+            writer.finish()
+            get_sink().flush()
+        writer.record()
+    finally:
+        with _writer_lock:
+            _writer = None
+        writer.close()
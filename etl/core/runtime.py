@@ -0,0 +1,229 @@
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Optional
+import pandas as pd
+from config import Config, load_config
+
+_client_lock = threading.Lock()
+_client: Any = None
+_scheduler: Optional["LoadScheduler"] = None
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """settings.toml, parsed once per process."""
+    return load_config()
+
+
+def table_id(table_key: str) -> str:
+    cfg = get_config()
+    project = cfg["bigquery"]["project_id"]
+    dataset = cfg["bigquery"]["dataset"]
+    return f"{project}.{dataset}.{cfg['tables'][table_key]}"
+
+
+def get_bigquery_client() -> Any:
+    """
+    One BigQuery client per process, created on first use.
+
+    The SDK is imported lazily so runs that never load anything (cache-only
+    benchmarks, offline development) do not pay for it, and the client's
+    HTTP session gets a connection pool sized for concurrent load jobs.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import google.auth
+            from google.auth.transport.requests import AuthorizedSession
+            from google.cloud import bigquery
+            from requests.adapters import HTTPAdapter
+
+            pool_size = get_config()["bigquery"]["pool_size"]
+            credentials, project = google.auth.default(scopes=bigquery.Client.SCOPE)
+            session = AuthorizedSession(credentials)
+            session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+            # No public option sizes the client's connection pool, so the
+            # session goes in through _http, which google-cloud-core 2.x
+            # documents as private; pyproject keeps google-cloud-bigquery
+            # below 4 (and so core below 3) until this is rechecked.
+            _client = bigquery.Client(project=project, credentials=credentials, _http=session)
+        return _client
+
+
+def merge_sql(target: str, staging: str, columns: list[str], keys: list[str]) -> str:
+    """MERGE staging into target: update rows whose keys match, insert the rest."""
+    on = " AND ".join(f"T.`{k}` = S.`{k}`" for k in keys)
+    updates = ", ".join(f"`{c}` = S.`{c}`" for c in columns if c not in keys)
+    cols = ", ".join(f"`{c}`" for c in columns)
+    values = ", ".join(f"S.`{c}`" for c in columns)
+    return (
+        f"MERGE `{target}` T USING `{staging}` S ON {on} "
+        f"WHEN MATCHED THEN UPDATE SET {updates} "
+        f"WHEN NOT MATCHED THEN INSERT ({cols}) VALUES ({values})"
+    )
+
+
+def replace_sql(target: str, staging: str, columns: list[str], column: str, values: list[int]) -> str:
+    """In one transaction, delete target's rows whose column is in values and insert staging."""
+    cols = ", ".join(f"`{c}`" for c in columns)
+    return (
+        "BEGIN TRANSACTION; "
+        f"DELETE FROM `{target}` WHERE `{column}` IN ({', '.join(str(int(v)) for v in values)}); "
+        f"INSERT INTO `{target}` ({cols}) SELECT {cols} FROM `{staging}`; "
+        "COMMIT TRANSACTION;"
+    )
+
+
+class LoadScheduler:
+    """
+    Runs BigQuery load jobs concurrently and waits for them together.
+
+    submit() returns immediately; wait() blocks until every submitted job has
+    finished, prints per-job latency and re-raises the first failure.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bq-load")
+        self._pending: list[tuple[str, Future[float], Optional[Callable[[], None]]]] = []
+
+    def submit(
+        self,
+        df: pd.DataFrame,
+        table_id: str,
+        write_disposition: str = "WRITE_APPEND",
+        on_error: Optional[Callable[[], None]] = None,
+        schema: Optional[list[Any]] = None,
+    ) -> None:
+        """Load df into table_id; with a schema (SchemaFields) nothing is inferred from dtypes."""
+        def run() -> None:
+            from google.cloud import bigquery
+
+            job = get_bigquery_client().load_table_from_dataframe(
+                df, table_id, job_config=bigquery.LoadJobConfig(write_disposition=write_disposition, schema=schema)
+            )
+            job.result()
+
+        self._submit(f"{df.shape[0]} rows into {table_id}", run, on_error)
+
+    def submit_parquet(
+        self,
+        paths: list[Path],
+        table_id: str,
+        schema: list[Any],
+        on_done: Optional[Callable[[], None]] = None,
+        on_error: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Append staged Parquet files to table_id in a single load job.
+
+        The files are combined into one upload first; on_done runs after the
+        job succeeds so the caller can discard them, on_error (from wait())
+        after it fails.
+        """
+        def run() -> None:
+            import pyarrow.parquet as pq
+            from google.cloud import bigquery
+
+            batch = paths[0].parent / f"_batch-{uuid.uuid4().hex}.parquet"
+            try:
+                with pq.ParquetWriter(batch, pq.read_schema(paths[0])) as writer:
+                    for path in paths:
+                        writer.write_table(pq.read_table(path))
+                with open(batch, "rb") as f:
+                    get_bigquery_client().load_table_from_file(
+                        f, table_id, job_config=bigquery.LoadJobConfig(
+                            source_format=bigquery.SourceFormat.PARQUET,
+                            write_disposition="WRITE_APPEND",
+                            schema=schema,
+                        ),
+                    ).result()
+            finally:
+                batch.unlink(missing_ok=True)
+            if on_done:
+                on_done()
+
+        self._submit(f"{len(paths)} staged files into {table_id}", run, on_error)
+
+    def submit_merge(
+        self,
+        df: pd.DataFrame,
+        table_id: str,
+        keys: list[str],
+        on_error: Optional[Callable[[], None]] = None,
+        schema: Optional[list[Any]] = None,
+    ) -> None:
+        """Upsert df into table_id on keys via a staging table and a MERGE."""
+        def run() -> None:
+            from google.cloud import bigquery
+
+            client = get_bigquery_client()
+            staging = f"{table_id}__staging_{uuid.uuid4().hex[:12]}"
+            client.load_table_from_dataframe(
+                df, staging, job_config=bigquery.LoadJobConfig(write_disposition="WRITE_TRUNCATE", schema=schema)
+            ).result()
+            try:
+                client.query(merge_sql(table_id, staging, list(df.columns), keys)).result()
+            finally:
+                client.delete_table(staging, not_found_ok=True)
+
+        self._submit(f"{df.shape[0]} rows merged into {table_id}", run, on_error)
+
+    def submit_replace(
+        self,
+        df: pd.DataFrame,
+        table_id: str,
+        column: str,
+        values: list[int],
+        on_error: Optional[Callable[[], None]] = None,
+        schema: Optional[list[Any]] = None,
+    ) -> None:
+        """Replace table_id's rows whose column is in values with df, atomically."""
+        def run() -> None:
+            from google.cloud import bigquery
+
+            client = get_bigquery_client()
+            staging = f"{table_id}__staging_{uuid.uuid4().hex[:12]}"
+            client.load_table_from_dataframe(
+                df, staging, job_config=bigquery.LoadJobConfig(write_disposition="WRITE_TRUNCATE", schema=schema)
+            ).result()
+            try:
+                client.query(replace_sql(table_id, staging, list(df.columns), column, values)).result()
+            finally:
+                client.delete_table(staging, not_found_ok=True)
+
+        self._submit(f"{df.shape[0]} rows replacing {len(values)} {column} partitions of {table_id}", run, on_error)
+
+    def _submit(self, label: str, job: Callable[[], None], on_error: Optional[Callable[[], None]]) -> None:
+        def run() -> float:
+            started = time.perf_counter()
+            job()
+            return time.perf_counter() - started
+
+        self._pending.append((label, self._pool.submit(run), on_error))
+
+    def wait(self) -> None:
+        pending, self._pending = self._pending, []
+        first_error: Optional[BaseException] = None
+        for label, future, on_error in pending:
+            try:
+                latency = future.result()
+            except Exception as e:
+                print(f"Failed to load {label}: {e}")
+                if on_error:
+                    on_error()
+                first_error = first_error or e
+                continue
+            print(f"Loaded {label} in {latency:.1f}s")
+        if first_error:
+            raise first_error
+
+
+def get_load_scheduler() -> LoadScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LoadScheduler(get_config()["bigquery"]["load_concurrency"])
+    return _scheduler
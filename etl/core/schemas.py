@@ -0,0 +1,81 @@
+from typing import Any, Optional
+import pandas as pd
+import pyarrow as pa
+from etl.core.runtime import get_config
+
+_ARROW_TYPES = {
+    "STRING": pa.string(),
+    "INT64": pa.int64(),
+    "FLOAT64": pa.float64(),
+    "BOOL": pa.bool_(),
+    "DATE": pa.date32(),
+    "DATETIME": pa.timestamp("us"),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+    "TIME": pa.time64("us"),
+}
+_TEMPORAL = {"DATE", "DATETIME", "TIMESTAMP", "TIME"}
+
+
+class TableSchema:
+    """
+    A table's declared columns from [schemas.<table_key>] in settings.toml.
+
+    Frames are converted to this schema before they are written, so every
+    window produces the same column types instead of whatever pandas
+    inferred for it. Bump `version` whenever the columns change.
+    """
+
+    def __init__(self, table_key: str, version: int, columns: dict[str, str]) -> None:
+        unknown = sorted(set(columns.values()) - set(_ARROW_TYPES))
+        if unknown:
+            raise ValueError(f"[schemas.{table_key}] uses unknown types {unknown}")
+        self.table_key = table_key
+        self.version = version
+        self.columns = columns
+
+    @property
+    def arrow(self) -> pa.Schema:
+        return pa.schema(
+            [pa.field(name, _ARROW_TYPES[kind]) for name, kind in self.columns.items()],
+            metadata={"schema_version": str(self.version)},
+        )
+
+    def bigquery_fields(self) -> list[Any]:
+        from google.cloud import bigquery
+
+        return [bigquery.SchemaField(name, kind) for name, kind in self.columns.items()]
+
+    def conform(self, df: pd.DataFrame) -> pa.Table:
+        """
+        df as an Arrow table with exactly the declared columns and types.
+
+        Declared columns missing from df are written as nulls. Columns that are
+        not declared, and values that do not convert losslessly (such as 1.5
+        into INT64), raise ValueError.
+        """
+        extra = sorted(set(df.columns) - set(self.columns))
+        if extra:
+            raise ValueError(f"{self.table_key}: columns {extra} are not in schema v{self.version}")
+        arrays = []
+        for name, kind in self.columns.items():
+            target = _ARROW_TYPES[kind]
+            if name not in df.columns:
+                arrays.append(pa.nulls(len(df), target))
+                continue
+            try:
+                if kind in _TEMPORAL:
+                    # sub-microsecond precision is dropped rather than rejected
+                    arrays.append(pa.array(df[name], from_pandas=True).cast(target, safe=False))
+                else:
+                    arrays.append(pa.array(df[name], type=target, from_pandas=True))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"{self.table_key}.{name} does not fit {kind}: {e}") from e
+        return pa.Table.from_arrays(arrays, schema=self.arrow)
+
+
+def table_schema(table_key: str) -> Optional[TableSchema]:
+    """The declared schema for table_key, or None if it has none."""
+    cfg = get_config().get("schemas", {}).get(table_key)
+    if not cfg:
+        return None
+    return TableSchema(table_key, cfg["version"], cfg["columns"])
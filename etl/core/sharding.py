@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from typing import Callable, Optional
+from etl.core.cache import is_offline
+from etl.core.runtime import get_config
+
+TIMESTAMP_FMT = "%Y-%m-%dT%H:%M:%S.000"
+
+Window = tuple[datetime, datetime]
+
+
+def _split(window: Window, min_span: timedelta) -> Optional[tuple[Window, Window]]:
+    # the cut falls on a midnight even when the window's own bounds do not
+    start, end = window
+    first_midnight = datetime.combine(start.date(), time())
+    if first_midnight < start:
+        first_midnight += timedelta(days=1)
+    mid = first_midnight + timedelta(days=(end - first_midnight).days // 2)
+    if mid - start < min_span or end - mid < min_span:
+        return None
+    return (start, mid), (mid, end)
+
+
+def plan_shards(
+    windows: list[Window],
+    count: Callable[[str, str], int],
+    max_rows: int,
+    min_days: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> list[tuple[str, str]]:
+    """
+    Split windows until each holds at most max_rows source rows.
+
+    Every candidate window is sized with a cheap count(*) probe; windows over
+    budget are halved at a midnight, down to min_days, and probed again.
+    Shards keep the windows' own start and end times, so only the cuts
+    between them are day-aligned. Probes for a round run concurrently.
+    Offline, or when a probe fails, windows are kept as they are. Returns
+    the shards in order, as Socrata timestamps.
+    """
+    cfg = get_config()
+    min_span = timedelta(days=min_days or cfg["backfill"]["shard_min_days"])
+    concurrency = concurrency or cfg["socrata"]["max_concurrency"]
+
+    def probe(window: Window) -> Optional[int]:
+        try:
+            return count(window[0].strftime(TIMESTAMP_FMT), window[1].strftime(TIMESTAMP_FMT))
+        except Exception as e:
+            print(f"Could not count rows for {window[0]:%Y-%m-%d} → {window[1]:%Y-%m-%d}: {e}")
+            return None
+
+    if is_offline():
+        print("Offline: keeping windows unsharded")
+        final = list(windows)
+    else:
+        final, pending = [], list(windows)
+        probes = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while pending:
+                counts = list(pool.map(probe, pending))
+                probes += len(pending)
+                next_round: list[Window] = []
+                for window, rows in zip(pending, counts):
+                    halves = _split(window, min_span) if rows is not None and rows > max_rows else None
+                    if halves:
+                        next_round.extend(halves)
+                    else:
+                        final.append(window)
+                pending = next_round
+        print(f"Planned {len(final)} shards of at most ~{max_rows} rows from {len(windows)} windows ({probes} probes)")
+
+    return [(s.strftime(TIMESTAMP_FMT), e.strftime(TIMESTAMP_FMT)) for s, e in sorted(final)]
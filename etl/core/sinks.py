@@ -0,0 +1,487 @@
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Optional, Protocol
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from etl.core.runtime import get_config, get_load_scheduler, table_id
+from etl.core.schemas import table_schema
+from etl.core.state import ROOT_DIR
+
+OnError = Optional[Callable[[], None]]
+
+_sink: Optional["Sink"] = None
+_sink_lock = threading.Lock()
+
+
+class Sink(Protocol):
+    def target(self, table_key: str) -> str:
+        """Identifies where table_key lands; used in logs and local state."""
+        ...
+
+    def write(
+        self,
+        table_key: str,
+        df: pd.DataFrame,
+        write_disposition: str = "WRITE_APPEND",
+        on_error: OnError = None,
+    ) -> None: ...
+
+    def merge(self, table_key: str, df: pd.DataFrame, keys: list[str], on_error: OnError = None) -> None:
+        """Upsert df into table_key: rows whose keys already exist are replaced."""
+        ...
+
+    def replace(
+        self, table_key: str, df: pd.DataFrame, column: str, values: list[int], on_error: OnError = None
+    ) -> None:
+        """Atomically replace the rows of table_key whose column is in values with df."""
+        ...
+
+    def flush(self) -> None:
+        """Block until every write so far is durable, raising on failure."""
+        ...
+
+    def commit(self) -> None:
+        """Load whatever writes the sink has staged; a no-op for sinks that stage nothing."""
+        ...
+
+
+def _table_name(table_key: str) -> str:
+    return get_config()["tables"][table_key]
+
+
+def _table_key(table: str) -> str:
+    return next(key for key, name in get_config()["tables"].items() if name == table)
+
+
+class BigQuerySink:
+    """Load jobs against the configured dataset, run through the LoadScheduler."""
+
+    def target(self, table_key: str) -> str:
+        return table_id(table_key)
+
+    def write(self, table_key: str, df: pd.DataFrame, write_disposition: str = "WRITE_APPEND", on_error: OnError = None) -> None:
+        get_load_scheduler().submit(df, self.target(table_key), write_disposition, on_error, _bigquery_schema(table_key))
+
+    def merge(self, table_key: str, df: pd.DataFrame, keys: list[str], on_error: OnError = None) -> None:
+        get_load_scheduler().submit_merge(df, self.target(table_key), keys, on_error, _bigquery_schema(table_key))
+
+    def replace(
+        self, table_key: str, df: pd.DataFrame, column: str, values: list[int], on_error: OnError = None
+    ) -> None:
+        get_load_scheduler().submit_replace(
+            df, self.target(table_key), column, values, on_error, _bigquery_schema(table_key)
+        )
+
+    def flush(self) -> None:
+        get_load_scheduler().wait()
+
+    def commit(self) -> None:
+        pass
+
+
+def _bigquery_schema(table_key: str) -> Optional[list[Any]]:
+    schema = table_schema(table_key)
+    return schema.bigquery_fields() if schema else None
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _unclaim(claim_dir: Path, staging_dir: Path) -> None:
+    """Return a claim's parts to staging_dir for the next commit."""
+    for part in claim_dir.glob("part-*.parquet"):
+        try:
+            os.rename(part, staging_dir / part.name)
+        except FileNotFoundError:
+            continue
+    shutil.rmtree(claim_dir, ignore_errors=True)
+
+
+class StagedBigQuerySink(BigQuerySink):
+    """
+    Appends go to Parquet files under <path>/staging/<table>/v<version>,
+    written with the table's declared schema, and are loaded by commit() as
+    one job per table however many windows they came from.
+
+    Truncating writes, merges, partition replaces and tables without a
+    declared schema are loaded directly, as with the plain bigquery backend.
+    Staged files survive a crash and are picked up by the next commit() of
+    the same schema version, or before the next merge or replace of their
+    table, so they cannot land on top of it afterwards. A commit claims the
+    files it loads, so processes committing at once never load a file twice.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path / "staging"
+
+    def _staging_dir(self, table_key: str, version: int) -> Path:
+        return self.path / _table_name(table_key) / f"v{version}"
+
+    def write(self, table_key: str, df: pd.DataFrame, write_disposition: str = "WRITE_APPEND", on_error: OnError = None) -> None:
+        schema = table_schema(table_key)
+        if schema is None or write_disposition == "WRITE_TRUNCATE":
+            if schema:
+                # staged appends would land on top of the replaced table
+                shutil.rmtree(self._staging_dir(table_key, schema.version), ignore_errors=True)
+            super().write(table_key, df, write_disposition, on_error)
+            return
+        try:
+            table = schema.conform(df)
+            staging_dir = self._staging_dir(table_key, schema.version)
+            staging_dir.mkdir(parents=True, exist_ok=True)
+            path = staging_dir / f"part-{uuid.uuid4().hex}.parquet"
+            tmp = path.with_suffix(".tmp")
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+        except Exception:
+            if on_error:
+                on_error()
+            raise
+        print(f"Staged {df.shape[0]} rows for {self.target(table_key)}")
+
+    def merge(self, table_key: str, df: pd.DataFrame, keys: list[str], on_error: OnError = None) -> None:
+        self._commit_table(table_key)
+        super().merge(table_key, df, keys, on_error)
+
+    def replace(
+        self, table_key: str, df: pd.DataFrame, column: str, values: list[int], on_error: OnError = None
+    ) -> None:
+        self._commit_table(table_key)
+        super().replace(table_key, df, column, values, on_error)
+
+    def _claim_staged(self, staging_dir: Path) -> list[Path]:
+        # Each part is renamed into a directory of this commit before it is
+        # loaded, so a part reaches exactly one load job even when backfill
+        # workers and the parent commit at the same time. Claims left by a
+        # process that died are returned to the staging dir first.
+        for claim in staging_dir.glob("claim-*"):
+            if not _process_alive(int(claim.name.split("-")[1])):
+                _unclaim(claim, staging_dir)
+        claim_dir = staging_dir / f"claim-{os.getpid()}-{uuid.uuid4().hex}"
+        claim_dir.mkdir(parents=True)
+        claimed = []
+        for part in sorted(staging_dir.glob("part-*.parquet")):
+            try:
+                os.rename(part, claim_dir / part.name)
+            except FileNotFoundError:
+                continue  # claimed by another commit
+            claimed.append(claim_dir / part.name)
+        if not claimed:
+            claim_dir.rmdir()
+        return claimed
+
+    def _submit_staged(self, table_key: str) -> bool:
+        schema = table_schema(table_key)
+        if schema is None:
+            return False
+        staging_dir = self._staging_dir(table_key, schema.version)
+        if not staging_dir.exists():
+            return False
+        parts = self._claim_staged(staging_dir)
+        if not parts:
+            return False
+        claim_dir = parts[0].parent
+        get_load_scheduler().submit_parquet(
+            parts, self.target(table_key), schema.bigquery_fields(),
+            on_done=lambda: shutil.rmtree(claim_dir, ignore_errors=True),
+            on_error=lambda: _unclaim(claim_dir, staging_dir),
+        )
+        return True
+
+    def _commit_table(self, table_key: str) -> None:
+        if self._submit_staged(table_key):
+            get_load_scheduler().wait()
+
+    def commit(self) -> None:
+        for table_key in get_config()["tables"]:
+            self._submit_staged(table_key)
+        get_load_scheduler().wait()
+
+
+class _LocalSink:
+    """Synchronous sinks: a failed write runs on_error and raises immediately."""
+
+    name = ""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def target(self, table_key: str) -> str:
+        return f"{self.name}:{self.path / _table_name(table_key)}"
+
+    def write(self, table_key: str, df: pd.DataFrame, write_disposition: str = "WRITE_APPEND", on_error: OnError = None) -> None:
+        try:
+            self._write(_table_name(table_key), df, write_disposition == "WRITE_TRUNCATE")
+        except Exception:
+            if on_error:
+                on_error()
+            raise
+        print(f"Loaded {df.shape[0]} rows into {self.target(table_key)}")
+
+    def merge(self, table_key: str, df: pd.DataFrame, keys: list[str], on_error: OnError = None) -> None:
+        try:
+            self._merge(_table_name(table_key), df, keys)
+        except Exception:
+            if on_error:
+                on_error()
+            raise
+        print(f"Merged {df.shape[0]} rows into {self.target(table_key)}")
+
+    def replace(
+        self, table_key: str, df: pd.DataFrame, column: str, values: list[int], on_error: OnError = None
+    ) -> None:
+        try:
+            self._replace(_table_name(table_key), df, column, values)
+        except Exception:
+            if on_error:
+                on_error()
+            raise
+        print(f"Replaced {len(values)} {column} partitions of {self.target(table_key)} with {df.shape[0]} rows")
+
+    def _write(self, table: str, df: pd.DataFrame, truncate: bool) -> None:
+        raise NotImplementedError
+
+    def _merge(self, table: str, df: pd.DataFrame, keys: list[str]) -> None:
+        raise NotImplementedError
+
+    def _replace(self, table: str, df: pd.DataFrame, column: str, values: list[int]) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def commit(self) -> None:
+        pass
+
+
+class ParquetSink(_LocalSink):
+    """One directory per table, hive-partitioned on the table's configured columns."""
+
+    name = "parquet"
+
+    def __init__(self, path: Path, partition_columns: dict[str, list[str]]) -> None:
+        super().__init__(path)
+        self.partition_columns = partition_columns
+
+    def _partition_cols(self, table: str, df: pd.DataFrame) -> list[str]:
+        return [c for c in self.partition_columns.get(_table_key(table), []) if c in df.columns]
+
+    def _write(self, table: str, df: pd.DataFrame, truncate: bool) -> None:
+        table_dir = self.path / table
+        if truncate:
+            shutil.rmtree(table_dir, ignore_errors=True)
+        self._write_dataset(table, df, table_dir)
+
+    def _write_dataset(self, table: str, df: pd.DataFrame, root: Path) -> None:
+        root.mkdir(parents=True, exist_ok=True)
+        partition_cols = self._partition_cols(table, df)
+        schema = table_schema(_table_key(table))
+        pq.write_to_dataset(
+            schema.conform(df) if schema else pa.Table.from_pandas(df, preserve_index=False),
+            root,
+            partition_cols=partition_cols or None,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        )
+
+    def _replace(self, table: str, df: pd.DataFrame, column: str, values: list[int]) -> None:
+        # The new partitions are written next to the table (dot-prefixed dirs
+        # are ignored by readers) and swapped in one rename each.
+        table_dir = self.path / table
+        if self._partition_cols(table, df)[:1] != [column]:
+            raise ValueError(f"{table} is not partitioned on {column} first; see [sink.partition_columns]")
+        staging = table_dir / f".replace-{uuid.uuid4().hex}"
+        try:
+            self._write_dataset(table, df, staging)
+            for value in values:
+                new, old = staging / f"{column}={value}", table_dir / f"{column}={value}"
+                trash = table_dir / f".old-{uuid.uuid4().hex}"
+                if old.exists():
+                    os.replace(old, trash)
+                if new.exists():
+                    os.replace(new, old)
+                shutil.rmtree(trash, ignore_errors=True)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def _merge(self, table: str, df: pd.DataFrame, keys: list[str]) -> None:
+        # Only the partitions the incoming rows fall in are rewritten; the
+        # partition columns must not change for an existing key.
+        table_dir = self.path / table
+        if not table_dir.exists():
+            self._write(table, df, truncate=False)
+            return
+        partition_cols = self._partition_cols(table, df)
+        groups = df.groupby(partition_cols, dropna=False) if partition_cols else [((), df)]
+        for group, incoming in groups:
+            values: tuple[Any, ...] = group if isinstance(group, tuple) else (group,)
+            part_dir = table_dir.joinpath(*(
+                f"{col}={'__HIVE_DEFAULT_PARTITION__' if pd.isna(v) else v}"
+                for col, v in zip(partition_cols, values)
+            ))
+            old_files = sorted(part_dir.glob("*.parquet")) if part_dir.exists() else []
+            incoming = incoming.drop(columns=partition_cols)
+            existing = [pq.read_table(f).to_pandas() for f in old_files]
+            merged = pd.concat(
+                [e[~e.set_index(keys).index.isin(incoming.set_index(keys).index)] for e in existing] + [incoming],
+                ignore_index=True,
+            )
+            part_dir.mkdir(parents=True, exist_ok=True)
+            pq.write_table(
+                pa.Table.from_pandas(merged, preserve_index=False),
+                part_dir / f"part-{uuid.uuid4().hex}-0.parquet",
+            )
+            for f in old_files:
+                f.unlink()
+
+
+class DuckDBSink(_LocalSink):
+    """
+    Tables in one embedded DuckDB file.
+
+    DuckDB allows a single writing process, so use it with one backfill worker.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, path: Path) -> None:
+        import duckdb  # optional dependency, only needed for this backend
+
+        super().__init__(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = duckdb.connect(str(path))
+        self._lock = threading.Lock()
+
+    def _write(self, table: str, df: pd.DataFrame, truncate: bool) -> None:
+        with self._lock:
+            self.conn.register("incoming", df)
+            try:
+                if truncate:
+                    self.conn.execute(f'CREATE OR REPLACE TABLE "{table}" AS SELECT * FROM incoming')
+                else:
+                    self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" AS SELECT * FROM incoming LIMIT 0')
+                    self.conn.execute(f'INSERT INTO "{table}" BY NAME SELECT * FROM incoming')
+            finally:
+                self.conn.unregister("incoming")
+
+    def _merge(self, table: str, df: pd.DataFrame, keys: list[str]) -> None:
+        match = " AND ".join(f'"{table}"."{k}" = incoming."{k}"' for k in keys)
+        with self._lock:
+            self.conn.register("incoming", df)
+            try:
+                self.conn.execute("BEGIN")
+                self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" AS SELECT * FROM incoming LIMIT 0')
+                self.conn.execute(f'DELETE FROM "{table}" USING incoming WHERE {match}')
+                self.conn.execute(f'INSERT INTO "{table}" BY NAME SELECT * FROM incoming')
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            finally:
+                self.conn.unregister("incoming")
+
+    def _replace(self, table: str, df: pd.DataFrame, column: str, values: list[int]) -> None:
+        with self._lock:
+            self.conn.register("incoming", df)
+            try:
+                self.conn.execute("BEGIN")
+                self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" AS SELECT * FROM incoming LIMIT 0')
+                self.conn.execute(f'DELETE FROM "{table}" WHERE "{column}" IN ({", ".join(str(int(v)) for v in values)})')
+                self.conn.execute(f'INSERT INTO "{table}" BY NAME SELECT * FROM incoming')
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            finally:
+                self.conn.unregister("incoming")
+
+
+class SQLiteSink(_LocalSink):
+    """Tables in one SQLite file; safe to share between backfill workers."""
+
+    name = "sqlite"
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _write(self, table: str, df: pd.DataFrame, truncate: bool) -> None:
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            with conn:
+                df.to_sql(table, conn, if_exists="replace" if truncate else "append", index=False)
+        finally:
+            conn.close()
+
+    def _merge(self, table: str, df: pd.DataFrame, keys: list[str]) -> None:
+        conn = sqlite3.connect(self.path, timeout=60)
+        staging = f"{table}__staging_{uuid.uuid4().hex[:12]}"
+        try:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+            if not exists:
+                with conn:
+                    df.to_sql(table, conn, index=False)
+                return
+            df.to_sql(staging, conn, index=False)
+            cols = ", ".join(f'"{c}"' for c in df.columns)
+            match = " AND ".join(f'"{table}"."{k}" = s."{k}"' for k in keys)
+            with conn:
+                conn.execute(f'DELETE FROM "{table}" WHERE EXISTS (SELECT 1 FROM "{staging}" s WHERE {match})')
+                conn.execute(f'INSERT INTO "{table}" ({cols}) SELECT {cols} FROM "{staging}"')
+        finally:
+            conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            conn.commit()
+            conn.close()
+
+    def _replace(self, table: str, df: pd.DataFrame, column: str, values: list[int]) -> None:
+        conn = sqlite3.connect(self.path, timeout=60)
+        staging = f"{table}__staging_{uuid.uuid4().hex[:12]}"
+        try:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+            if not exists:
+                with conn:
+                    df.to_sql(table, conn, index=False)
+                return
+            df.to_sql(staging, conn, index=False)
+            cols = ", ".join(f'"{c}"' for c in df.columns)
+            with conn:
+                conn.execute(f'DELETE FROM "{table}" WHERE "{column}" IN ({", ".join(str(int(v)) for v in values)})')
+                conn.execute(f'INSERT INTO "{table}" ({cols}) SELECT {cols} FROM "{staging}"')
+        finally:
+            conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+            conn.commit()
+            conn.close()
+
+
+def get_sink() -> Sink:
+    """The process-wide sink selected by [sink].backend in settings.toml."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            cfg = get_config()["sink"]
+            path = ROOT_DIR / cfg["path"]
+            backend = cfg["backend"]
+            if backend == "bigquery":
+                _sink = BigQuerySink()
+            elif backend == "bigquery_staged":
+                _sink = StagedBigQuerySink(path)
+            elif backend == "parquet":
+                _sink = ParquetSink(path, cfg["partition_columns"])
+            elif backend == "duckdb":
+                _sink = DuckDBSink(path / "warehouse.duckdb")
+            elif backend == "sqlite":
+                _sink = SQLiteSink(path / "warehouse.sqlite")
+            else:
+                raise ValueError(f"Unknown sink backend {backend!r}")
+        return _sink
@@ -0,0 +1,339 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Iterator, Optional, TypeVar, cast
+import csv
+import io
+import queue
+import threading
+import time
+import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import requests
+import urllib3
+from sodapy import Socrata  # type: ignore
+from config.env import NYC_API_TOKEN
+from etl.core.cache import arrow_to_frame
+from etl.core.runtime import get_config
+from etl.core.throttle import call_with_retries, get_controller, retry_delay
+
+DOMAIN = "data.cityofnewyork.us"
+
+T = TypeVar("T")
+Rename = Callable[[list[str]], list[str]]
+
+
+def get_client() -> Socrata:
+    return Socrata(DOMAIN, NYC_API_TOKEN, timeout=get_config()["socrata"]["timeout_seconds"])
+
+
+@lru_cache(maxsize=None)
+def dataset_columns(resource: str) -> frozenset[str]:
+    """API field names of a dataset, from its metadata."""
+    meta = call_with_retries(lambda: get_client().get_metadata(resource), f"{resource} metadata")
+    return frozenset(col["fieldName"] for col in meta.get("columns", []))
+
+
+def select_clause(resource: str, columns: list[str]) -> Optional[str]:
+    """
+    $select for the wanted columns that resource actually has.
+
+    Asking for a field a dataset lacks fails the whole query, and the FY
+    parking tables do not all share one schema. None means fetch every column.
+    """
+    try:
+        available = dataset_columns(resource)
+    except Exception as e:
+        print(f"Could not read {resource} metadata, fetching all columns: {e}")
+        return None
+    present = [c for c in columns if c in available]
+    return ", ".join(present) if present else None
+
+
+def count_rows(resource: str, where: str) -> int:
+    """Rows matching a SoQL filter, via a single count(*) query."""
+    client = get_client()
+    rows = call_with_retries(
+        lambda: client.get(resource, select="count(*) AS n", where=where), f"{resource} count"
+    )
+    return int(rows[0]["n"]) if rows else 0
+
+
+def _page_bounds(page_size: int, limit: Optional[int]) -> Iterator[tuple[int, int]]:
+    offset = 0
+    while limit is None or offset < limit:
+        size = page_size if limit is None else min(page_size, limit - offset)
+        yield offset, size
+        offset += size
+
+
+def iter_pages(
+    resource: str,
+    where: str,
+    page_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    select: Optional[str] = None,
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Page through a SoQL query, yielding at most page_size records at a time.
+
+    Pages are requested ahead of the consumer, as many at once as the
+    process-wide AIMD controller currently allows (never more than
+    `concurrency`), and are still yielded in offset order. Pages are ordered
+    on the system row id so $offset paging is stable. Each page is retried on
+    its own when throttled or dropped (see throttle.call_with_retries), so a
+    failure resumes from that page rather than from the start of the query.
+    limit caps the total number of records returned, and select is passed
+    through as $select; if Socrata rejects it (HTTP 400), every column is
+    fetched instead.
+    """
+    cfg = get_config()["socrata"]
+    page_size = page_size or cfg["page_size"]
+    concurrency = concurrency or cfg["max_concurrency"]
+    controller = get_controller()
+    client = get_client()
+    params = {"select": select} if select else {}
+
+    def get(offset: int, size: int) -> list[dict[str, Any]]:
+        return call_with_retries(
+            lambda: client.get(resource, where=where, order=":id", limit=size, offset=offset, **params),
+            f"{resource} page at offset {offset}",
+        )
+
+    def fetch(offset: int, size: int) -> list[dict[str, Any]]:
+        try:
+            return get(offset, size)
+        except requests.HTTPError as e:
+            if not (params and e.response is not None and e.response.status_code == 400):
+                raise
+            print(f"{resource} rejected $select={params.get('select')!r}, fetching all columns")
+            params.clear()
+            return get(offset, size)
+
+    bounds = _page_bounds(page_size, limit)
+    pending: deque[tuple[int, Future[list[dict[str, Any]]]]] = deque()
+
+    def fill(pool: ThreadPoolExecutor) -> None:
+        while len(pending) < max(1, min(concurrency, controller.limit)):
+            next_page = next(bounds, None)
+            if next_page is None:
+                return
+            pending.append((next_page[1], pool.submit(fetch, *next_page)))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            fill(pool)
+            while pending:
+                size, future = pending.popleft()
+                recs = future.result()
+                if recs:
+                    yield recs
+                if len(recs) < size:
+                    return
+                fill(pool)
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def iter_frames(
+    resource: str,
+    where: str,
+    page_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    select: Optional[str] = None,
+) -> Iterator[pd.DataFrame]:
+    """DataFrame-per-page variant of iter_pages."""
+    for recs in iter_pages(resource, where, page_size, limit, concurrency, select):
+        yield pd.DataFrame.from_records(recs)
+
+
+def _csv_batches(response: requests.Response, rename: Optional[Rename]) -> pacsv.CSVStreamingReader:
+    # the header is read (and renamed) here, once; Arrow decodes the rest of
+    # the stream incrementally, every column as a nullable string as in JSON
+    response.raw.decode_content = True
+    response.raw.auto_close = False  # let the buffered reader see EOF
+    stream = io.BufferedReader(cast(io.RawIOBase, response.raw))
+    names = next(csv.reader([stream.readline().decode("utf-8-sig")]), [])
+    if rename:
+        names = rename(names)
+    return pacsv.open_csv(
+        stream,
+        read_options=pacsv.ReadOptions(column_names=names),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in names}, strings_can_be_null=True,
+        ),
+    )
+
+
+def iter_csv_frames(
+    resource: str,
+    where: str,
+    page_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    select: Optional[str] = None,
+    rename: Optional[Rename] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    iter_frames over Socrata's CSV export instead of its JSON pages.
+
+    Rows are streamed ([socrata].csv_request_rows per request) through
+    pyarrow's incremental CSV reader and re-cut into frames of page_size
+    rows, so records never become Python dicts. rename is applied to the
+    header. A stream that breaks off is resumed from the last row received.
+    """
+    cfg = get_config()["socrata"]
+    page_size = page_size or cfg["page_size"]
+    headers = {"X-App-Token": NYC_API_TOKEN} if NYC_API_TOKEN else {}
+    params: dict[str, Any] = {"$select": select} if select else {}
+    session = requests.Session()
+
+    def open_stream(offset: int, size: int) -> requests.Response:
+        def get() -> requests.Response:
+            response = session.get(
+                f"https://{DOMAIN}/resource/{resource}.csv",
+                params={"$where": where, "$order": ":id", "$limit": size, "$offset": offset, **params},
+                headers=headers, stream=True, timeout=cfg["timeout_seconds"],
+            )
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                response.close()
+                raise
+            return response
+
+        try:
+            return call_with_retries(get, f"{resource} CSV at offset {offset}")
+        except requests.HTTPError as e:
+            if not (params and e.response is not None and e.response.status_code == 400):
+                raise
+            print(f"{resource} rejected $select={params.get('$select')!r}, fetching all columns")
+            params.clear()
+            return call_with_retries(get, f"{resource} CSV at offset {offset}")
+
+    buffered: Optional[pa.Table] = None
+    offset, attempt = 0, 0
+    with session:
+        while limit is None or offset < limit:
+            size = cfg["csv_request_rows"] if limit is None else min(cfg["csv_request_rows"], limit - offset)
+            received = 0
+            try:
+                with open_stream(offset, size) as response:
+                    for batch in _csv_batches(response, rename):
+                        attempt = 0  # the stream is making progress again
+                        received += batch.num_rows
+                        table = pa.Table.from_batches([batch])
+                        buffered = table if buffered is None else pa.concat_tables([buffered, table])
+                        while buffered.num_rows >= page_size:
+                            yield arrow_to_frame(buffered.slice(0, page_size))
+                            buffered = buffered.slice(page_size)
+            except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+                # the stream broke off after the request succeeded
+                delay = retry_delay(requests.ConnectionError(e), attempt)
+                if delay is None or attempt >= cfg["max_retries"]:
+                    raise
+                attempt += 1
+                offset += received
+                print(f"{resource} CSV stream failed ({e}); resuming at offset {offset} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            offset += received
+            if received < size:
+                break
+    if buffered is not None and buffered.num_rows:
+        yield arrow_to_frame(buffered)
+
+
+def iter_window_frames(
+    resource: str,
+    where: str,
+    page_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    select: Optional[str] = None,
+    rename: Optional[Rename] = None,
+) -> Iterator[pd.DataFrame]:
+    """Bulk window extract over the [socrata].transport ("json" or "csv") endpoint."""
+    if get_config()["socrata"]["transport"] == "csv":
+        yield from iter_csv_frames(resource, where, page_size, limit, select, rename)
+        return
+    for df in iter_frames(resource, where, page_size, limit, select=select):
+        if rename:
+            df.columns = pd.Index(rename(list(df.columns)))
+        yield df
+
+
+def concat_frames(frames: Iterator[pd.DataFrame]) -> pd.DataFrame:
+    chunks = list(frames)
+    if not chunks:
+        return pd.DataFrame()
+    # pd.concat turns categoricals whose categories differ between pages
+    # into plain strings, so give every page the union of the categories
+    for col in chunks[0].columns:
+        if not all(col in c.columns and isinstance(c[col].dtype, pd.CategoricalDtype) for c in chunks):
+            continue
+        categories = union_categoricals([c[col] for c in chunks]).categories
+        for c in chunks:
+            c[col] = c[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def iter_concurrently(sources: list[Callable[[], Iterator[T]]]) -> Iterator[T]:
+    """
+    Drain several iterators at once, yielding their items in source order.
+
+    Each source runs on its own thread, and at most one finished item per
+    source waits to be consumed, so memory stays bounded: all of the first
+    source's items are yielded before the second's, while later sources
+    pause once they have an item waiting. The output does not depend on
+    which source answers first. The first error is re-raised. If the
+    consumer stops early, the remaining sources are closed.
+    """
+    if len(sources) == 1:
+        yield from sources[0]()
+        return
+
+    queues: list[queue.Queue[tuple[str, Any]]] = [queue.Queue(maxsize=1) for _ in sources]
+    stop = threading.Event()
+
+    def put(ready: queue.Queue[tuple[str, Any]], kind: str, value: Any) -> bool:
+        while not stop.is_set():
+            try:
+                ready.put((kind, value), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def drain(make: Callable[[], Iterator[T]], ready: queue.Queue[tuple[str, Any]]) -> None:
+        it = make()
+        try:
+            for item in it:
+                if not put(ready, "item", item):
+                    return
+        except BaseException as e:
+            put(ready, "error", e)
+        finally:
+            close = getattr(it, "close", None)
+            if close:
+                close()
+            put(ready, "done", None)
+
+    with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="source") as pool:
+        for make, ready in zip(sources, queues):
+            pool.submit(drain, make, ready)
+        try:
+            for ready in queues:
+                while True:
+                    kind, value = ready.get()
+                    if kind == "item":
+                        yield value
+                    elif kind == "error":
+                        raise value
+                    else:
+                        break
+        finally:
+            stop.set()
@@ -0,0 +1,117 @@
+"""
+Local Parquet spill for windows too large to transform in memory.
+
+Chunks are transformed one at a time with the usual pandas code and
+appended to per-table Parquet datasets under [spill].dir. What needs the
+whole window (deduplicating dimension members, checking fact keys against
+them) then runs as DuckDB queries over those files, which stream from disk
+within [spill].memory_limit, and results come back in bounded batches.
+"""
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Iterator, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from etl.core.runtime import get_config
+from etl.core.schemas import table_schema
+from etl.core.state import ROOT_DIR
+
+SEQ_COLUMN = "_seq"
+
+
+class SpillStore:
+    """
+    Parquet datasets for one run, removed again by close().
+
+    Every appended row gets a run-wide sequence number, so "first
+    occurrence" means the same thing as it does for a single in-memory
+    frame.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        import duckdb  # optional dependency, only needed for this engine
+
+        cfg = get_config()["spill"]
+        self.path = path or ROOT_DIR / cfg["dir"] / uuid.uuid4().hex
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.batch_rows = cfg["batch_rows"]
+        self._seq = 0
+        self._parts: dict[str, int] = {}
+        self.conn = duckdb.connect()
+        self.conn.execute(f"SET memory_limit = '{cfg['memory_limit']}'")
+        self.conn.execute(f"SET temp_directory = '{self.path / '_duckdb'}'")
+
+    def append(self, name: str, df: pd.DataFrame, table_key: Optional[str] = None) -> None:
+        """
+        Add df to dataset name. With table_key, the table's declared schema
+        keeps column types the same from chunk to chunk.
+        """
+        if df.empty:
+            return
+        schema = table_schema(table_key) if table_key else None
+        table = schema.conform(df) if schema else pa.Table.from_pandas(df, preserve_index=False)
+        table = table.append_column(SEQ_COLUMN, pa.array(range(self._seq, self._seq + len(df)), pa.int64()))
+        self._seq += len(df)
+        part = self._parts.get(name, 0)
+        self._parts[name] = part + 1
+        (self.path / name).mkdir(exist_ok=True)
+        pq.write_table(table, self.path / name / f"part-{part:05d}.parquet")
+
+    def has(self, name: str) -> bool:
+        return name in self._parts
+
+    def _source(self, name: str) -> str:
+        return f"read_parquet('{self.path / name}/*.parquet')"
+
+    def _batches(self, sql: str) -> Iterator[pd.DataFrame]:
+        reader = self.conn.execute(sql).fetch_record_batch(self.batch_rows)
+        for batch in reader:
+            # nullable Int64 keys, as the in-memory path produces
+            yield batch.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+    def distinct(self, name: str, key: str) -> Iterator[pd.DataFrame]:
+        """Dataset name with one row per key (its first), in batches."""
+        if not self.has(name):
+            return iter(())
+        return self._batches(
+            f"SELECT * EXCLUDE ({SEQ_COLUMN}) FROM {self._source(name)} "
+            f"QUALIFY row_number() OVER (PARTITION BY \"{key}\" ORDER BY {SEQ_COLUMN}) = 1 "
+            f"ORDER BY {SEQ_COLUMN}"
+        )
+
+    def resolve(self, name: str, lookups: dict[str, str]) -> Iterator[pd.DataFrame]:
+        """
+        Dataset name in batches, with each column in lookups nulled where its
+        value does not appear in the same column of that dataset (a missing
+        lookup dataset nulls the whole column), as a left join would.
+        """
+        if not self.has(name):
+            return iter(())
+        columns = self.conn.execute(f"DESCRIBE SELECT * FROM {self._source(name)}").fetchall()
+        select = []
+        for column, *_ in columns:
+            if column == SEQ_COLUMN:
+                continue
+            lookup = lookups.get(column)
+            if lookup is None:
+                select.append(f'"{column}"')
+            elif self.has(lookup):
+                select.append(
+                    f'CASE WHEN "{column}" IN (SELECT "{column}" FROM {self._source(lookup)}) '
+                    f'THEN "{column}" END AS "{column}"'
+                )
+            else:
+                select.append(f'NULL::BIGINT AS "{column}"')
+        return self._batches(f"SELECT {', '.join(select)} FROM {self._source(name)} ORDER BY {SEQ_COLUMN}")
+
+    def close(self) -> None:
+        self.conn.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self) -> "SpillStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
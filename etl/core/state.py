@@ -0,0 +1,42 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+from etl.core.runtime import get_config
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
+
+def state_dir() -> Path:
+    path = ROOT_DIR / get_config()["state"]["dir"]
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class JsonStateStore:
+    """
+    Small key/value store persisted as one JSON file under the state dir.
+
+    Writes go through a temp file and os.replace, so an interrupted run never
+    leaves a half-written file behind.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.path = state_dir() / f"{name}.json"
+
+    def load(self) -> dict[str, Any]:
+        if not self.path.exists():
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.load().get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        data = self.load()
+        data[key] = value
+        tmp = self.path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
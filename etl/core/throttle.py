@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterator, Optional, TypeVar
+import requests
+from etl.core.runtime import get_config
+
+T = TypeVar("T")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_controller: Optional["AimdController"] = None
+_controller_lock = threading.Lock()
+
+
+class AimdController:
+    """
+    Process-wide cap on concurrent requests, adjusted additive-increase /
+    multiplicative-decrease.
+
+    Each success below latency_factor times the baseline latency adds one
+    slot per current-limit's worth of successes. A slow success gives one
+    slot back. A throttled or failed request halves the limit. The baseline
+    is the fastest recent latency and drifts upward slowly, so it follows
+    changes in page size.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_factor: float = 2.0) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        with self._cond:
+            baseline = self._baseline
+            self._baseline = latency if baseline is None else min(latency, baseline * 1.02)
+            if baseline is not None and latency > self.latency_factor * baseline:
+                self._limit = max(self.minimum, self._limit - 1)
+            else:
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self._limit = max(self.minimum, self._limit / 2)
+
+
+def get_controller() -> AimdController:
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            cfg = get_config()["socrata"]
+            _controller = AimdController(cfg["concurrency"], cfg["min_concurrency"], cfg["max_concurrency"])
+        return _controller
+
+
+def _retry_after(response: Optional[requests.Response]) -> Optional[float]:
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying after error, or None if it is not retryable."""
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        if response is None or response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            return retry_after
+    elif not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return None
+    cfg = get_config()["socrata"]
+    # full jitter: spread retries from many threads instead of synchronizing them
+    return random.uniform(0, min(cfg["backoff_max_seconds"], cfg["backoff_base_seconds"] * 2 ** attempt))
+
+
+def call_with_retries(call: Callable[[], T], what: str) -> T:
+    """
+    Run call inside a controller slot, retrying throttling, server errors,
+    timeouts and dropped connections with exponential backoff.
+    """
+    controller = get_controller()
+    max_retries = get_config()["socrata"]["max_retries"]
+    attempt = 0
+    while True:
+        try:
+            with controller.slot():
+                # time the request only: waiting for a slot is not server latency
+                started = time.perf_counter()
+                result = call()
+                latency = time.perf_counter() - started
+        except Exception as e:
+            delay = retry_delay(e, attempt)
+            if delay is None or attempt >= max_retries:
+                raise
+            controller.on_throttle()
+            attempt += 1
+            print(f"{what} failed ({e}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        controller.on_success(latency)
+        return result
@@ -0,0 +1,47 @@
+from datetime import time
+import numpy as np
+import pandas as pd
+
+# "0853P" / "853P" (hours then two minute digits) or "8:53A" / "08:5A",
+# after trimming and upper-casing; anything else is unparseable
+_VIOLATION_TIME = r"^(?:([0-9]{1,2}):([0-9]{1,2})|([0-9]{1,2})([0-9]{2}))([AP])$"
+
+
+def date_keys(ts: pd.Series) -> pd.Series:
+    """YYYYMMDD integer keys for a datetime column, NA where the timestamp is NaT."""
+    return (ts.dt.year * 10000 + ts.dt.month * 100 + ts.dt.day).astype("Int64")
+
+
+def time_keys(ts: pd.Series) -> pd.Series:
+    """Minute-level HHMM00 integer keys for a datetime column, NA where NaT."""
+    return (ts.dt.hour * 10000 + ts.dt.minute * 100).astype("Int64")
+
+
+def parse_violation_times(s: pd.Series) -> pd.Series:
+    """
+    HHMM00 keys for parking violation_time strings such as "0853P" or "8:53A".
+
+    Only distinct values are parsed and the result is broadcast back, so the
+    cost follows the number of distinct strings. Values that are not a valid
+    12-hour clock time give NA.
+    """
+    codes, uniques = pd.factorize(s)
+    raw = pd.Series(uniques, dtype=object).map(str).str.strip().str.upper()
+    parts = raw.str.extract(_VIOLATION_TIME)
+    hour = pd.to_numeric(parts[0].fillna(parts[2]))
+    minute = pd.to_numeric(parts[1].fillna(parts[3]))
+    valid = hour.between(1, 12) & minute.between(0, 59)
+    hour24 = hour % 12 + np.where(parts[4] == "P", 12, 0)
+    keys = (hour24 * 10000 + minute * 100).where(valid).astype("Int64")
+    return pd.Series(keys.array.take(codes, allow_fill=True), index=s.index)
+
+
+def keys_to_times(keys: pd.Series) -> pd.Series:
+    """datetime.time values (None where NA) for HHMM00 keys."""
+    codes, uniques = pd.factorize(keys)
+    # the trailing None is what code -1 (NA) picks up
+    times = np.array(
+        [time(int(k) // 10000, int(k) // 100 % 100) for k in uniques] + [None],
+        dtype=object,
+    )
+    return pd.Series(times[codes], index=keys.index)
@@ -1,16 +1,195 @@
 import hashlib
+from datetime import datetime, timedelta
+from typing import cast
+import numpy as np
 import pandas as pd
+from pandas.api.extensions import ExtensionDtype
+from pandas.api.types import pandas_dtype
+from etl.core.runtime import get_config
+
+
+def _md5_key(value: str) -> int:
+    return int(hashlib.md5(value.encode()).hexdigest(), 16) % (10**9)
 
 
 def hash_key(row: pd.Series, columns: list[str]) -> int:
     """ Generate a stable, numeric hash key based on row contents. """
     input_str = "|".join(str(row[col]) for col in columns)
-    return int(hashlib.md5(input_str.encode()).hexdigest(), 16) % (10**9)
+    return _md5_key(input_str)
 
-def normalize_strings(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
-    """Standardizes string columns for hashing or join use."""
-    df = df.copy()
+
+def _str_values(s: pd.Series) -> pd.Series:
+    """s with each non-missing value of a mixed-type object column as its str().
+
+    pd.factorize treats values that compare equal (1, 1.0, True) as one,
+    but their str() differ, and keys and normalized values come from str().
+    """
+    if s.dtype != object or pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty"):
+        return s
+    return s.where(s.isna(), s.map(str))
+
+
+def _factorize_str(s: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Factorize a column into codes plus the str() of each unique value.
+
+    Missing values are factorized separately by their string form so that
+    None, NaN and pd.NA keep the distinct labels hash_key would give them.
+    """
+    codes, uniques = pd.factorize(_str_values(s))
+    labels = np.asarray(pd.Series(uniques, dtype=object).map(str), dtype=object)
+    na_mask = codes == -1
+    if na_mask.any():
+        na_codes, na_uniques = pd.factorize(s[na_mask].astype(object).map(str))
+        codes[na_mask] = na_codes + len(labels)
+        labels = np.concatenate([labels, np.asarray(na_uniques, dtype=object)])
+    return codes.astype(np.int64), labels
+
+
+def hash_columns(df: pd.DataFrame, columns: list[str]) -> pd.Series:
+    """Vectorized hash_key over whole columns.
+
+    Each column is factorized, the per-column codes are combined into one id
+    per distinct tuple, and MD5 runs once per distinct tuple before being
+    broadcast back to the rows. Keys are identical to hash_key().
+    """
+    if df.empty:
+        return pd.Series(index=df.index, dtype="int64")
+
+    tuple_ids: np.ndarray | None = None
+    col_codes: list[np.ndarray] = []
+    col_labels: list[np.ndarray] = []
     for col in columns:
-        if col in df.columns:
-            df[col] = df[col].fillna("").astype(str).str.strip().str.lower()
+        codes, labels = _factorize_str(df[col])
+        col_codes.append(codes)
+        col_labels.append(labels)
+        if tuple_ids is None:
+            tuple_ids = codes
+        else:
+            # re-factorizing after each step keeps ids below len(df), so the
+            # mixed-radix combination can never overflow int64
+            tuple_ids, _ = pd.factorize(tuple_ids * len(labels) + codes)
+    assert tuple_ids is not None
+
+    _, first_rows = np.unique(tuple_ids, return_index=True)
+    parts = [labels[codes[first_rows]] for codes, labels in zip(col_codes, col_labels)]
+    keys = np.fromiter(
+        (_md5_key("|".join(values)) for values in zip(*parts)),
+        dtype=np.int64,
+        count=len(first_rows),
+    )
+    return pd.Series(keys[tuple_ids], index=df.index)
+
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    """Short hash of a frame's column names and dtypes."""
+    schema = ",".join(f"{col}:{dtype}" for col, dtype in df.dtypes.items())
+    return hashlib.sha1(schema.encode()).hexdigest()[:16]
+
+
+def _arrow_string_dtype() -> ExtensionDtype:
+    # Arrow-backed strings that still use NaN for missing values, so keys
+    # hash exactly as they do on the default object path. pandas 2.3 takes
+    # na_value; older versions spell this dtype "string[pyarrow_numpy]".
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)  # type: ignore[call-arg, unused-ignore]
+    except TypeError:
+        return cast(ExtensionDtype, pandas_dtype("string[pyarrow_numpy]"))
+
+
+def apply_dtype_strategy(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a raw Socrata frame according to [transform] in settings.toml.
+
+    With dtype_backend = "pyarrow", string columns become Arrow-backed and
+    the configured low-cardinality columns become categoricals. The default
+    "numpy" backend leaves the frame untouched.
+    """
+    cfg = get_config()["transform"]
+    if cfg["dtype_backend"] != "pyarrow":
+        return df
+    string_dtype = _arrow_string_dtype()
+    categorical = set(cfg["categorical_columns"])
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            continue  # nested objects such as the 311 location field
+        df[col] = df[col].astype(string_dtype)
+        if col in categorical:
+            df[col] = df[col].astype("category")
     return df
+
+
+def to_plain_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Undo categoricals before handing a frame to a loader."""
+    cat_cols = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    if not cat_cols:
+        return df
+    return df.astype({col: df[col].cat.categories.dtype for col in cat_cols})
+
+
+def _normalize_categorical(s: pd.Series) -> pd.Series:
+    # normalize each category once; categories that collapse to the same
+    # value ("Queens", "QUEENS ") are merged, and NaN maps to ""
+    cats = pd.Series(s.cat.categories).astype(str).str.strip().str.lower()
+    inverse, uniques = pd.factorize(pd.concat([cats, pd.Series([""])], ignore_index=True))
+    codes = s.cat.codes.to_numpy()
+    new_codes = np.where(codes == -1, inverse[-1], inverse[codes])
+    return pd.Series(
+        pd.Categorical.from_codes(new_codes, categories=pd.Index(uniques)),
+        index=s.index,
+        name=s.name,
+    )
+
+
+def _normalize_values(s: pd.Series) -> pd.Series:
+    # strip/lower each distinct value once and broadcast back; NA maps to ""
+    codes, uniques = pd.factorize(_str_values(s))
+    normalized = pd.Series(uniques, dtype=object).astype(str).str.strip().str.lower()
+    labels = np.append(normalized.to_numpy(dtype=object), "")
+    out = pd.Series(labels[codes], index=s.index, name=s.name)
+    if isinstance(s.dtype, pd.StringDtype):
+        return out.astype(s.dtype)
+    return out
+
+
+NORMALIZED_ATTR = "normalized_columns"
+
+
+def normalized_columns(df: pd.DataFrame) -> list[str]:
+    """Columns of df that normalize_strings has already handled."""
+    return list(df.attrs.get(NORMALIZED_ATTR, []))
+
+
+def mark_normalized(df: pd.DataFrame, columns: list[str]) -> None:
+    df.attrs[NORMALIZED_ATTR] = sorted(set(normalized_columns(df)) | set(columns))
+
+
+def normalize_strings(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    """
+    Standardizes string columns for hashing or join use.
+
+    Returns a new frame that shares its untouched columns with df. Each
+    column is normalized once: finished columns are recorded in df.attrs,
+    which pandas carries through slicing and copies, so later calls on
+    derived frames skip them. Code that renames a normalized column should
+    record the new name with mark_normalized().
+    """
+    done = set(normalized_columns(df))
+    todo = [col for col in columns if col in df.columns and col not in done]
+    if not todo:
+        return df.copy(deep=False)
+    # columns are replaced rather than written into, so a shallow copy is enough
+    df = df.copy(deep=False)
+    for col in todo:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            df[col] = _normalize_categorical(s)
+        else:
+            df[col] = _normalize_values(s)
+    mark_normalized(df, todo)
+    return df
+
+
+def yesterday_window() -> tuple[str, str]:
+    """Start/end timestamps covering yesterday (UTC)."""
+    today = datetime.utcnow().date()
+    return f"{today - timedelta(days=1)}T00:00:00.000", f"{today}T00:00:00.000"
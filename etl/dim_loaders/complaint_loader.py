@@ -1,17 +1,20 @@
 import pandas as pd
 from etl.core.dim_loader import BaseDimLoader
-from etl.core.utils import hash_key, normalize_strings
+from etl.core.utils import hash_columns, normalize_strings
 
 
 class ComplaintDimLoader(BaseDimLoader):
+    key_column = "complaint_key"
+    source_columns = ["complaint_type", "descriptor", "location_type"]
+
     def __init__(self) -> None:
         super().__init__("complaint_dim")
 
     def extract(self, df: pd.DataFrame) -> pd.DataFrame:
-        return df[["complaint_type", "descriptor", "location_type"]].drop_duplicates().copy()
+        return df[self.source_columns].drop_duplicates().copy()
 
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         columns = ["complaint_type", "descriptor", "location_type"]
         df = normalize_strings(df, columns)
-        df["complaint_key"] = df.apply(lambda row: hash_key(row, columns), axis=1)
+        df["complaint_key"] = hash_columns(df, columns)
         return df[["complaint_key"] + columns]
@@ -1,6 +1,7 @@
 from datetime import datetime
 import pandas as pd
 from etl.core.dim_loader import BaseDimLoader
+from etl.core.time_keys import date_keys
 
 
 class DateDimLoader(BaseDimLoader):
@@ -10,7 +11,7 @@ class DateDimLoader(BaseDimLoader):
     def generate_date_range(self, start_date: datetime, end_date: datetime) -> pd.DataFrame:
         dates = pd.date_range(start=start_date, end=end_date)
         df = pd.DataFrame({"full_date": dates})
-        df["date_key"] = df["full_date"].dt.strftime("%Y%m%d").astype(int)
+        df["date_key"] = date_keys(df["full_date"]).astype("int64")
         df["day"]      = df["full_date"].dt.day
         df["month"]    = df["full_date"].dt.month
         df["year"]     = df["full_date"].dt.year
@@ -1,28 +1,29 @@
 import pandas as pd
 from etl.core.dim_loader import BaseDimLoader
-from etl.core.utils import hash_key, normalize_strings
+from etl.core.utils import hash_columns, normalize_strings
 
 
 class LocationDimLoader(BaseDimLoader):
+    key_column = "location_key"
+    source_columns = [
+        "borough",
+        "city",
+        "incident_zip",
+        "street_name",
+        "incident_address",
+        "cross_street_1",
+        "cross_street_2",
+        "intersection_street_1",
+        "intersection_street_2",
+        "latitude",
+        "longitude",
+    ]
+
     def __init__(self) -> None:
         super().__init__("location_dim")
 
     def extract(self, df: pd.DataFrame) -> pd.DataFrame:
-        return df[
-            [
-                "borough",
-                "city",
-                "incident_zip",
-                "street_name",
-                "incident_address",
-                "cross_street_1",
-                "cross_street_2",
-                "intersection_street_1",
-                "intersection_street_2",
-                "latitude",
-                "longitude",
-            ]
-        ].drop_duplicates().copy()
+        return df[self.source_columns].drop_duplicates().copy()
 
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         string_columns = [
@@ -40,7 +41,7 @@ class LocationDimLoader(BaseDimLoader):
         df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
 
         # Hash based only on string columns (not lat/lon)
-        df["location_key"] = df.apply(lambda row: hash_key(row, string_columns), axis=1)
+        df["location_key"] = hash_columns(df, string_columns)
 
         return df[
             ["location_key"] + string_columns + ["latitude", "longitude"]
@@ -1,20 +1,22 @@
 import pandas as pd
 from etl.core.dim_loader import BaseDimLoader
-from etl.core.utils import hash_key, normalize_strings
+from etl.core.utils import hash_columns, normalize_strings
 
 class ParkingLocationDimLoader(BaseDimLoader):
+    key_column = "parking_location_key"
+    source_columns = [
+        "house_number",
+        "street_name",
+        "intersecting_street",
+        "violation_county",
+        "violation_precinct",
+    ]
+
     def __init__(self) -> None:
         super().__init__("parking_location_dim")
 
     def extract(self, df: pd.DataFrame) -> pd.DataFrame:
-        required_cols = [
-            "house_number",
-            "street_name",
-            "intersecting_street",
-            "violation_county",
-            "violation_precinct",
-        ]
-
+        required_cols = self.source_columns
         if not set(required_cols).issubset(df.columns):
             print("Skipping ParkingLocationDimLoader — missing columns.")
             return pd.DataFrame(columns=required_cols)
@@ -30,5 +32,5 @@ class ParkingLocationDimLoader(BaseDimLoader):
         ]
         df = normalize_strings(df, cols)
         df = df.dropna(subset=cols)
-        df["parking_location_key"] = df.apply(lambda row: hash_key(row, cols), axis=1)
+        df["parking_location_key"] = hash_columns(df, cols)
         return df[["parking_location_key"] + cols]
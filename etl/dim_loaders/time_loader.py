@@ -1,4 +1,5 @@
 from etl.core.dim_loader import BaseDimLoader
+import numpy as np
 import pandas as pd
 
 class TimeDimLoader(BaseDimLoader):
@@ -10,12 +11,8 @@ class TimeDimLoader(BaseDimLoader):
         Generate one row per minute from 00:00 to 23:59.
         time_key will be HHMM00 (seconds always zero).
         """
-        # Create a DatetimeIndex at 1-minute intervals
-        times = pd.date_range("00:00", "23:59", freq="T").time
-        df = pd.DataFrame({"time": times})
+        minutes = np.arange(24 * 60, dtype="int64")
+        df = pd.DataFrame({"hour": minutes // 60, "minute": minutes % 60})
         # HHMMSS as integer, but since seconds=00, this is HHMM00
-        df["time_key"] = df["time"].apply(lambda t: int(t.strftime("%H%M00")))
-        df["hour"]     = df["time"].apply(lambda t: t.hour)
-        df["minute"]   = df["time"].apply(lambda t: t.minute)
-        # drop the helper column
-        return df[["time_key", "hour", "minute"]]
\ No newline at end of file
+        df["time_key"] = df["hour"] * 10000 + df["minute"] * 100
+        return df[["time_key", "hour", "minute"]]
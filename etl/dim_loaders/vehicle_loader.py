@@ -1,9 +1,16 @@
 import pandas as pd
 from etl.core.dim_loader import BaseDimLoader
-from etl.core.utils import hash_key, normalize_strings
+from etl.core.utils import hash_columns, mark_normalized, normalize_strings, normalized_columns
 
 
 class VehicleDimLoader(BaseDimLoader):
+    key_column = "vehicle_key"
+    source_columns = [
+        "plate_id", "registration_state", "plate_type",
+        "vehicle_body_type", "vehicle_make", "vehicle_year",
+        "vehicle_color", "unregistered_vehicle",
+    ]
+
     def __init__(self) -> None:
         super().__init__("vehicle_dim")
 
@@ -16,11 +23,13 @@ class VehicleDimLoader(BaseDimLoader):
         # grab & dedupe
         out = df[raw_cols].drop_duplicates().copy()
         # rename to match your BQ dim schema
-        out.rename(columns={
+        renames = {
             "plate_id": "plate",
             "registration_state": "state",
             "plate_type": "license_type"
-        }, inplace=True)
+        }
+        out.rename(columns=renames, inplace=True)
+        mark_normalized(out, [renames[c] for c in normalized_columns(df) if c in renames])
         out = out.assign(
         vehicle_body_type = df["vehicle_body_type"],
         vehicle_make      = df["vehicle_make"],
@@ -34,7 +43,7 @@ class VehicleDimLoader(BaseDimLoader):
         key_cols = ["plate", "state", "license_type"]
         df = normalize_strings(df, key_cols)
         df = df.dropna(subset=key_cols)
-        df["vehicle_key"] = df.apply(lambda row: hash_key(row, key_cols), axis=1)
+        df["vehicle_key"] = hash_columns(df, key_cols)
         # return the key, the natural-key cols, AND the extra attrs
         return df[
             ["vehicle_key"] 
@@ -3,6 +3,9 @@ from etl.core.dim_loader import BaseDimLoader
 from etl.core.utils import normalize_strings
 
 class ViolationDimLoader(BaseDimLoader):
+    key_column = "violation_code"
+    source_columns = ["violation_code", "violation_description"]
+
     def __init__(self) -> None:
         super().__init__("violation_dim")
 
@@ -1,27 +1,121 @@
-from datetime import datetime, timedelta
+from typing import Iterator, Optional
 import pandas as pd
-from sodapy import Socrata  # type: ignore
-from google.cloud import bigquery
-from config.env import NYC_API_TOKEN
-from config import load_config
 
-from etl.core.utils import normalize_strings
-
-
-def get_311_data_between(start: str, end: str, limit: int = 10_000_000) -> pd.DataFrame:
-    client = Socrata("data.cityofnewyork.us", NYC_API_TOKEN)
-    where_clause = f"created_date >= '{start}' AND created_date < '{end}'"
+from etl.core.cache import ExtractCache, is_offline
+from etl.core.metrics import iter_stage, stage, timed
+from etl.core.partitions import get_partition_writer
+from etl.core.sinks import get_sink
+from etl.core.socrata import concat_frames, count_rows, iter_frames, iter_window_frames, select_clause
+from etl.core.time_keys import date_keys, time_keys
+from etl.core.utils import apply_dtype_strategy, normalize_strings, yesterday_window
+
+RESOURCE_311 = "erm2-nwe9"
+# descriptive columns that are trimmed and lower-cased before use
+NORMALIZED_COLUMNS = [
+    "agency", "agency_name", "complaint_type", "descriptor", "location_type",
+    "incident_zip", "incident_address", "street_name", "cross_street_1",
+    "cross_street_2", "intersection_street_1", "intersection_street_2",
+    "address_type", "city", "borough", "landmark", "facility_type",
+    "status", "resolution_description", "community_board", "bbl",
+    "open_data_channel", "park_facility_name", "park_borough",
+    "vehicle_type", "taxi_company_borough", "taxi_pickup_location",
+    "bridge_highway_name", "bridge_highway_direction", "road_ramp",
+    "bridge_highway_segment", "location"
+]
+# raw columns clean_311_data needs for the fact's own fields
+FACT_SOURCE_COLUMNS = [
+    "unique_key", "created_date", "closed_date", "due_date", "resolution_action_updated_date",
+]
+
+
+def _window_clause(start: str, end: str) -> str:
+    return f"created_date >= '{start}' AND created_date < '{end}'"
+
+
+def count_311_between(start: str, end: str) -> int:
+    return count_rows(RESOURCE_311, _window_clause(start, end))
+
+
+def iter_311_data_between(
+    start: str,
+    end: str,
+    chunk_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    columns: Optional[list[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the 311 records created in [start, end) in chunks of chunk_size rows.
+
+    With columns, only those fields are requested from Socrata.
+    """
+    where_clause = _window_clause(start, end)
     print(f"Fetching 311 data between: {start} → {end}")
-    results = client.get("erm2-nwe9", where=where_clause, limit=limit)
-    print(f"Fetched {len(results)} records")
-    return pd.DataFrame.from_records(results)
+    frames = ExtractCache().frames(
+        RESOURCE_311, start, end,
+        lambda: iter_window_frames(
+            RESOURCE_311, where_clause, chunk_size, limit,
+            select=select_clause(RESOURCE_311, columns) if columns else None,
+        ),
+        select=",".join(sorted(columns)) if columns else None,
+        limit=limit, chunk_size=chunk_size,
+    )
+    fetched = 0
+    for chunk in iter_stage("extract", frames, source="311"):
+        fetched += len(chunk)
+        print(f"Fetched {fetched} records")
+        with stage("parse", rows_in=len(chunk), source="311") as s:
+            chunk = apply_dtype_strategy(chunk)
+            s.rows_out = len(chunk)
+        yield chunk
+
+
+def get_311_data_between(
+    start: str, end: str, limit: Optional[int] = None, columns: Optional[list[str]] = None
+) -> pd.DataFrame:
+    return concat_frames(iter_311_data_between(start, end, limit=limit, columns=columns))
+
+
+def get_311_updates_since(
+    watermark: str, lookback_minutes: int = 0, columns: Optional[list[str]] = None
+) -> tuple[pd.DataFrame, Optional[str]]:
+    """
+    The latest version of every 311 record changed after watermark.
+
+    watermark is a Socrata :updated_at timestamp. The query starts
+    lookback_minutes before it, so rows that were still being written when
+    the previous run read the dataset are picked up again; applying them is
+    idempotent. Returns the records, without Socrata's system columns, and
+    the newest :updated_at seen (None when nothing changed).
+    """
+    if is_offline():
+        raise RuntimeError("Incremental 311 loads read live changes and cannot run offline")
+    since = pd.Timestamp(watermark.rstrip("Z")) - pd.Timedelta(minutes=lookback_minutes)
+    where_clause = f":updated_at > '{since.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}'"
+    print(f"Fetching 311 changes since {since}")
+    projection = select_clause(RESOURCE_311, columns) if columns else None
+    select = f":updated_at, {projection}" if projection else ":*, *"
+    raw = concat_frames(iter_stage(
+        "extract", iter_frames(RESOURCE_311, where_clause, select=select), source="311_updates",
+    ))
+    if raw.empty:
+        return raw, None
+    print(f"Fetched {len(raw)} changed records")
+
+    newest = raw[":updated_at"].max()
+    raw = (
+        raw.sort_values(":updated_at", kind="stable")
+           .drop_duplicates(subset=["unique_key"], keep="last")
+           .drop(columns=[c for c in raw.columns if c.startswith(":")])
+           .reset_index(drop=True)
+    )
+    with stage("parse", rows_in=len(raw), source="311_updates") as s:
+        raw = apply_dtype_strategy(raw)
+        s.rows_out = len(raw)
+    return raw, newest
 
 
 def get_yesterdays_311_data() -> pd.DataFrame:
-    today = datetime.utcnow().date()
-    start = f"{today - timedelta(days=1)}T00:00:00.000"
-    end = f"{today}T00:00:00.000"
-    return get_311_data_between(start, end)
+    return get_311_data_between(*yesterday_window())
 
 
 def get_311_data_for_year(year: int) -> pd.DataFrame:
@@ -30,6 +124,7 @@ def get_311_data_for_year(year: int) -> pd.DataFrame:
     return get_311_data_between(start, end, limit=500_000)
 
 
+@timed("clean", source="311")
 def clean_311_data(raw_df: pd.DataFrame) -> pd.DataFrame:
     """Cleans and formats the 311 data for loading into fact_311_complaints."""
     df = raw_df.copy()
@@ -46,44 +141,22 @@ def clean_311_data(raw_df: pd.DataFrame) -> pd.DataFrame:
         else:
             df[new_col] = pd.NaT
 
-    # safely build created_date_key and created_time_key
-    df["created_date_key"] = df["created_timestamp"].apply(
-        lambda ts: int(ts.strftime("%Y%m%d")) if pd.notnull(ts) else pd.NA
-    ).astype("Int64")
-    df["created_time_key"] = df["created_timestamp"].apply(
-        lambda ts: int(ts.strftime("%H%M00")) if pd.notnull(ts) else pd.NA
-    ).astype("Int64")
-
-    # safely build closed_date_key and closed_time_key
-    df["closed_date_key"] = df["closed_timestamp"].apply(
-        lambda ts: int(ts.strftime("%Y%m%d")) if pd.notnull(ts) else pd.NA
-    ).astype("Int64")
-    df["closed_time_key"] = df["closed_timestamp"].apply(
-        lambda ts: int(ts.strftime("%H%M00")) if pd.notnull(ts) else pd.NA
-    ).astype("Int64")
-    # 2) Compute our new date_key, complaint_time, and time_key from created_timestamp
-    df["date_key"] = df["created_timestamp"].dt.strftime("%Y%m%d").astype("Int64")
+    # 2) Integer date/time keys (YYYYMMDD / HHMM00), NA where the timestamp is missing
+    df["created_date_key"] = date_keys(df["created_timestamp"])
+    df["created_time_key"] = time_keys(df["created_timestamp"])
+    df["closed_date_key"] = date_keys(df["closed_timestamp"])
+    df["closed_time_key"] = time_keys(df["closed_timestamp"])
+    df["date_key"] = df["created_date_key"]
     df["complaint_time"] = df["created_timestamp"].dt.time
-    # minute‐level key: HHMM00 as integer
-    df["time_key"] = df["created_timestamp"].dt.strftime("%H%M00").astype("Int64")
+    df["time_key"] = df["created_time_key"]
 
     # 3) Ensure unique_key is present and cast to string
     if "unique_key" not in df.columns:
         raise ValueError("Missing required column 'unique_key' in 311 data")
     df["unique_key"] = df["unique_key"].astype(str)
     # 4) Standardize all our descriptive columns to lowercase & trim
-    norm_cols = [
-        "agency", "agency_name", "complaint_type", "descriptor", "location_type",
-        "incident_zip", "incident_address", "street_name", "cross_street_1",
-        "cross_street_2", "intersection_street_1", "intersection_street_2",
-        "address_type", "city", "borough", "landmark", "facility_type",
-        "status", "resolution_description", "community_board", "bbl",
-        "open_data_channel", "park_facility_name", "park_borough",
-        "vehicle_type", "taxi_company_borough", "taxi_pickup_location",
-        "bridge_highway_name", "bridge_highway_direction", "road_ramp",
-        "bridge_highway_segment", "location"
-    ]
-    df = normalize_strings(df, norm_cols)
+    #    (a no-op for columns main.prepare_311 already normalized)
+    df = normalize_strings(df, NORMALIZED_COLUMNS)
 
     # 5) Select exactly the cols your BQ table expects:
     target_cols = [
@@ -110,17 +183,17 @@ def clean_311_data(raw_df: pd.DataFrame) -> pd.DataFrame:
     return df[available]
 
 
-def load_to_bigquery(df: pd.DataFrame) -> None:
-    """Loads the cleaned 311 DataFrame into BigQuery."""
-    cfg = load_config()
-    project = cfg["bigquery"]["project_id"]
-    dataset = cfg["bigquery"]["dataset"]
-    table = cfg["tables"]["fact_311_complaints"]
-    table_id = f"{project}.{dataset}.{table}"
-
-    client = bigquery.Client()
+@timed("fact_load", table="fact_311_complaints")
+def load_fact(df: pd.DataFrame) -> None:
+    """Loads the cleaned 311 DataFrame into the configured sink."""
+    writer = get_partition_writer()
+    if writer:
+        writer.write("fact_311_complaints", df, "unique_key", "created_date_key")
+    else:
+        get_sink().write("fact_311_complaints", df)
 
-    job = client.load_table_from_dataframe(df, table_id)
-    job.result()
 
-    print(f"Loaded {df.shape[0]} rows to {table_id}")
+@timed("fact_merge", table="fact_311_complaints")
+def merge_fact(df: pd.DataFrame) -> None:
+    """Upserts cleaned 311 rows into fact_311_complaints on unique_key."""
+    get_sink().merge("fact_311_complaints", df, ["unique_key"])
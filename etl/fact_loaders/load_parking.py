@@ -1,12 +1,18 @@
-from typing import Any, Optional
+import re
+from functools import partial
+from typing import Callable, Iterator, Optional
 from datetime import datetime, timedelta
 import pandas as pd
-from sodapy import Socrata  # type: ignore
-from google.cloud import bigquery
 from config.env import NYC_API_TOKEN
-from config import load_config
 
-from etl.core.utils import normalize_strings, hash_key
+from etl.core.cache import ExtractCache, is_offline
+from etl.core.metrics import iter_stage, stage, timed
+from etl.core.partitions import get_partition_writer
+from etl.core.sinks import get_sink
+from etl.core.runtime import get_config
+from etl.core.socrata import concat_frames, count_rows, iter_concurrently, iter_window_frames, select_clause
+from etl.core.time_keys import date_keys, keys_to_times, parse_violation_times
+from etl.core.utils import apply_dtype_strategy, normalize_strings, hash_columns, yesterday_window
 
 PARKING_DATASETS = {
     2014: "jt7v-77mi",
@@ -23,50 +29,138 @@ PARKING_DATASETS = {
 }
 LATEST_FY = max(PARKING_DATASETS)
 EARLIEST_FY = min(PARKING_DATASETS)
+# raw columns clean_parking_data needs for the fact's own fields; some FY
+# tables name the code "violation"
+FACT_SOURCE_COLUMNS = [
+    "summons_number", "issue_date", "violation_time", "violation_code", "violation",
+    "house_number", "street_name", "intersecting_street", "violation_county", "violation_precinct",
+]
 
 
-def get_yesterdays_parking_data():
-    today = datetime.utcnow().date()
-    start = f"{today - timedelta(days=1)}T00:00:00.000"
-    end = f"{today}T00:00:00.000"
-    return get_parking_data_between(start, end)
+def fiscal_year(day: datetime) -> int:
+    """NYC fiscal year of a date: FY N runs from July 1 of N-1 to June 30 of N."""
+    return day.year + 1 if day.month >= 7 else day.year
 
 
-def get_parking_data_between(start: str, end: str, limit: int = 5_000_000) -> pd.DataFrame:
-    if not NYC_API_TOKEN:
-        raise ValueError("Missing NYC_API_TOKEN. Check your .env file.")
+def plan_fy_resources(start: str, end: str, spillover: Optional[int] = None) -> list[tuple[int, str]]:
+    """
+    Every FY dataset that may hold tickets issued in [start, end).
 
-    client = Socrata("data.cityofnewyork.us", NYC_API_TOKEN)
-    start_dt = datetime.strptime(start[:10], "%Y-%m-%d")
-    fy = start_dt.year if start_dt.month < 7 else start_dt.year + 1
-    if fy < EARLIEST_FY:
-        return pd.DataFrame()
-
-    if fy > LATEST_FY:
-        fy = LATEST_FY
-    resource = PARKING_DATASETS[fy]
-    clause = (
-        f"issue_date >= '{start}' "
-        f"AND issue_date < '{end}' "
-    )
-    print(f"Fetching parking FY{fy} from {resource} between {start}–{end}")
-    recs: list[dict[str, Any]] = client.get(resource, where=clause, limit=limit)
-    print(f"Fetched {len(recs)} records from {resource} between {start}–{end}")
-    df = pd.DataFrame.from_records(recs)
+    That is each fiscal year the window touches, plus `spillover` later years
+    ([parking].fy_spillover by default), since tickets keep being entered
+    after their fiscal year closes. Windows past the newest published year
+    map to the latest dataset. The FYs the window itself covers come first.
+    """
+    if spillover is None:
+        spillover = get_config()["parking"]["fy_spillover"]
+    first = fiscal_year(datetime.strptime(start[:10], "%Y-%m-%d"))
+    last = fiscal_year(datetime.strptime(end[:10], "%Y-%m-%d") - timedelta(days=1))
+    last = max(first, last)
+    fys = [fy for fy in range(first, last + spillover + 1) if fy in PARKING_DATASETS]
+    if last > LATEST_FY and LATEST_FY not in fys:
+        fys.append(LATEST_FY)
+    return [(fy, PARKING_DATASETS[fy]) for fy in fys]
+
+
+def _window_clause(start: str, end: str) -> str:
+    return f"issue_date >= '{start}' AND issue_date < '{end}'"
+
+
+def count_parking_between(start: str, end: str) -> int:
+    """Tickets issued in [start, end) across the planned FY datasets (an upper bound)."""
+    return sum(count_rows(resource, _window_clause(start, end)) for _, resource in plan_fy_resources(start, end))
 
+
+def get_yesterdays_parking_data() -> pd.DataFrame:
+    return get_parking_data_between(*yesterday_window())
+
+
+def normalize_parking_names(names: list[str]) -> list[str]:
     # Normalize Socrata’s column names to lower+underscores
-    df.columns = (
-        df.columns
-          .str.strip()
-          .str.lower()
-          .str.replace(r"\s+", "_", regex=True)
-    )
+    names = [re.sub(r"\s+", "_", name.strip().lower()) for name in names]
     # Socrata FY tables call the code “violation”, not “violation_code”
-    if "violation" in df.columns and "violation_code" not in df.columns:
-        df.rename(columns={"violation": "violation_code"}, inplace=True)
+    if "violation" in names and "violation_code" not in names:
+        names = ["violation_code" if name == "violation" else name for name in names]
+    return names
+
 
+def normalize_parking_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # extracts are normalized on the header as they are fetched; this catches
+    # frames from elsewhere, such as extracts cached before that
+    names = normalize_parking_names(list(df.columns))
+    if names != list(df.columns):
+        df.columns = pd.Index(names)
     return df
 
+
+def iter_parking_data_between(
+    start: str,
+    end: str,
+    chunk_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    columns: Optional[list[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yields the parking tickets issued in [start, end) in chunks of chunk_size rows.
+
+    Every FY dataset from plan_fy_resources() is fetched concurrently and
+    tickets are deduplicated on summons_number, keeping the earliest FY's
+    copy. With columns, only those
+    fields are requested from Socrata.
+    """
+    if not NYC_API_TOKEN and not is_offline():
+        raise ValueError("Missing NYC_API_TOKEN. Check your .env file.")
+
+    plan = plan_fy_resources(start, end)
+    if not plan:
+        return
+    clause = _window_clause(start, end)
+
+    def fetch_fy(fy: int, resource: str) -> Iterator[pd.DataFrame]:
+        print(f"Fetching parking FY{fy} from {resource} between {start}–{end}")
+        frames = ExtractCache().frames(
+            resource, start, end,
+            lambda: iter_window_frames(
+                resource, clause, chunk_size, limit,
+                select=select_clause(resource, columns) if columns else None,
+                rename=normalize_parking_names,
+            ),
+            select=",".join(sorted(columns)) if columns else None,
+            limit=limit, chunk_size=chunk_size,
+        )
+        fetched = 0
+        for chunk in iter_stage("extract", frames, source="parking", resource=resource):
+            fetched += len(chunk)
+            print(f"Fetched {fetched} records from {resource} between {start}–{end}")
+            yield chunk
+
+    # the same ticket can be published in more than one FY dataset; chunks
+    # come in plan order, so the earliest FY's copy is kept and the rows
+    # (and the day hashes of fact partitions) are the same on every run
+    seen: set[str] = set()
+    sources: list[Callable[[], Iterator[pd.DataFrame]]] = [
+        partial(fetch_fy, fy, resource) for fy, resource in plan
+    ]
+    for chunk in iter_concurrently(sources):
+        with stage("parse", rows_in=len(chunk), source="parking") as s:
+            chunk = normalize_parking_columns(chunk)
+            if "summons_number" in chunk.columns:
+                numbers = chunk["summons_number"].astype(str)
+                keep = ~numbers.duplicated() & ~numbers.isin(seen)
+                seen.update(numbers[keep])
+                chunk = chunk[keep.to_numpy()].reset_index(drop=True)
+            chunk = apply_dtype_strategy(chunk)
+            s.rows_out = len(chunk)
+        if not chunk.empty:
+            yield chunk
+
+
+def get_parking_data_between(
+    start: str, end: str, limit: Optional[int] = None, columns: Optional[list[str]] = None
+) -> pd.DataFrame:
+    return concat_frames(iter_parking_data_between(start, end, limit=limit, columns=columns))
+
+@timed("clean", source="parking")
 def clean_parking_data(raw: pd.DataFrame) -> pd.DataFrame:
 
     df = raw.copy()
@@ -81,41 +175,11 @@ def clean_parking_data(raw: pd.DataFrame) -> pd.DataFrame:
 
     # 2) parse dates
     df["issue_date"] = pd.to_datetime(df["issue_date"], errors="coerce")
-    df["date_key"] = (df["issue_date"].dt.strftime("%Y%m%d").astype("Int64"))
-
-    # 3) parse times of form "09:03A" / "04:15P" ⇒ HH:MM:SS
-    def parse_violation_time(s: Any) -> Optional[datetime.time]:
-        """
-        Handle strings like "0853P", "8:53A", "12:05PM", returning a Python time or None.
-        """
-        if pd.isna(s):
-            return None
-        raw = str(s).strip().upper()
-        if not raw or raw[-1] not in {"A", "P"}:
-            return None
-
-        ampm = raw[-1] + "M"              # "P" -> "PM", "A" -> "AM"
-        core = raw[:-1]                   # strip off the marker
-
-        # insert colon if missing (e.g. "0853" -> "08:53")
-        if ":" not in core and len(core) in {3, 4}:
-            hours = core[:-2]
-            mins  = core[-2:]
-            core  = f"{hours.zfill(2)}:{mins}"
-
-        ts_str = core + ampm              # e.g. "08:53PM"
-        parsed = pd.to_datetime(ts_str, format="%I:%M%p", errors="coerce")
-        if pd.isna(parsed):
-            return None
-        return parsed.time()
-
-
-    df["violation_time"] = df["violation_time"].apply(parse_violation_time)
-    df["time_key"] = (
-        df["violation_time"]
-        .apply(lambda t: int(t.strftime("%H%M00")) if t else pd.NA)
-        .astype("Int64")
-    )
+    df["date_key"] = date_keys(df["issue_date"])
+
+    # 3) parse times of form "0853P" / "8:53A" into HHMM00 keys
+    df["time_key"] = parse_violation_times(df["violation_time"])
+    df["violation_time"] = keys_to_times(df["time_key"])
 
     # 4) normalize the fields we'll hash for location_key
     loc_cols = [
@@ -127,7 +191,7 @@ def clean_parking_data(raw: pd.DataFrame) -> pd.DataFrame:
     ]
     df = normalize_strings(df, loc_cols)
     df = df.dropna(subset=loc_cols)
-    df["location_key"] = df.apply(lambda r: hash_key(r, loc_cols), axis=1)
+    df["location_key"] = hash_columns(df, loc_cols)
 
     if "violation_code" not in df.columns and "violation" in df.columns:
         df = df.rename(columns={"violation": "violation_code"})
@@ -139,15 +203,10 @@ def clean_parking_data(raw: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def load_to_bigquery(df: pd.DataFrame) -> None:
-    cfg = load_config()
-    project = cfg["bigquery"]["project_id"]
-    dataset = cfg["bigquery"]["dataset"]
-    table = cfg["tables"]["fact_parking_tickets"]
-    table_id = f"{project}.{dataset}.{table}"
-
-    client = bigquery.Client()
-    job = client.load_table_from_dataframe(df, table_id)
-    job.result()
-
-    print(f"Loaded {df.shape[0]} rows to {table_id}")
+@timed("fact_load", table="fact_parking_tickets")
+def load_fact(df: pd.DataFrame) -> None:
+    writer = get_partition_writer()
+    if writer:
+        writer.write("fact_parking_tickets", df, "summons_number", "date_key")
+    else:
+        get_sink().write("fact_parking_tickets", df)
@@ -1,18 +1,141 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-import subprocess
+from typing import Optional
+import argparse
+import multiprocessing
 
-START = datetime(2013, 7, 1)
-TODAY = datetime.today()
-current = START
+from etl.core import metrics
+from etl.core.cache import set_offline
+from etl.core.runtime import get_config
+from etl.core.sharding import TIMESTAMP_FMT, plan_shards
+from etl.core.state import JsonStateStore
 
-while current < TODAY:
-    next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
 
-    start_str = current.strftime("%Y-%m-%dT00:00:00.000")
-    end_str = next_month.strftime("%Y-%m-%dT00:00:00.000")
+def plan_windows(start: datetime, end: datetime) -> list[tuple[str, str]]:
+    """Split [start, end) into calendar-month windows."""
+    windows = []
+    current = start
+    while current < end:
+        next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        windows.append((current.strftime(TIMESTAMP_FMT), next_month.strftime(TIMESTAMP_FMT)))
+        current = next_month
+    return windows
 
-    print(f"📅 Running ETL for {start_str} → {end_str}")
-    subprocess.run(["python", "main.py", "--start", start_str, "--end", end_str])
 
-    current = next_month
+def plan_backfill(start: datetime, end: datetime, max_rows: Optional[int], manifest_name: str) -> list[tuple[str, str]]:
+    """
+    Month windows, split into shards of at most max_rows source rows.
 
+    A plan is computed once per (start, end, max_rows) and stored next to the
+    manifest, so a resumed backfill runs the same shards rather than
+    re-probing and possibly re-cutting windows that were partly loaded.
+    """
+    if not max_rows:
+        return plan_windows(start, end)
+    plans = JsonStateStore(f"{manifest_name}_plan")
+    key = f"{start:%Y-%m-%d}/{end:%Y-%m-%d}/{max_rows}"
+    stored = plans.get(key)
+    if stored:
+        return [tuple(w) for w in stored]  # type: ignore[misc]
+    from main import count_source_rows
+
+    months = [(datetime.fromisoformat(s[:10]), datetime.fromisoformat(e[:10])) for s, e in plan_windows(start, end)]
+    shards = plan_shards(months, count_source_rows, max_rows)
+    plans.set(key, shards)
+    return shards
+
+
+def _init_worker(profile: bool) -> None:
+    # pay for the heavy imports once per worker rather than once per window
+    import main  # noqa: F401
+
+    if profile:
+        metrics.set_profiling()
+
+
+def _run_window(start: str, end: str, chunk_size: Optional[int]) -> None:
+    import main
+
+    # the parent commits staged writes in batches of windows
+    main.main(start=start, end=end, chunk_size=chunk_size, load_static_dims=False, commit=False)
+
+
+def backfill(
+    start: datetime,
+    end: datetime,
+    workers: int,
+    chunk_size: Optional[int] = None,
+    manifest_name: str = "backfill_manifest",
+    profile: bool = False,
+    max_rows: Optional[int] = None,
+) -> None:
+    """
+    Run the ETL for every month in [start, end) across a process pool.
+
+    With max_rows, busy months are split into evenly sized shards first (see
+    plan_backfill). Finished windows are recorded in a manifest under the
+    state dir, so an interrupted backfill picks up where it stopped. With a
+    staging sink, writes are committed every [backfill].commit_every windows;
+    whatever an interrupted run staged is committed when the next one starts.
+    """
+    from etl.core.sinks import get_sink
+    from main import load_date_and_time_dims
+
+    sink = get_sink()
+    sink.commit()
+    commit_every = get_config()["backfill"]["commit_every"]
+
+    manifest = JsonStateStore(manifest_name)
+    done = manifest.load()
+    windows = [w for w in plan_backfill(start, end, max_rows, manifest_name) if f"{w[0]}/{w[1]}" not in done]
+    print(f"📅 {len(windows)} windows to run ({len(done)} already done) on {workers} workers")
+    if not windows:
+        return
+
+    load_date_and_time_dims()
+
+    failed = []
+    finished = 0
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(profile,)) as pool:
+        futures = {pool.submit(_run_window, s, e, chunk_size): (s, e) for s, e in windows}
+        for future in as_completed(futures):
+            s, e = futures[future]
+            try:
+                future.result()
+            except Exception as exc:
+                print(f"❌ ETL failed for {s} → {e}: {exc}")
+                failed.append((s, e))
+                continue
+            manifest.set(f"{s}/{e}", {"completed_at": datetime.utcnow().isoformat()})
+            print(f"✅ ETL finished for {s} → {e}")
+            finished += 1
+            if commit_every and finished % commit_every == 0:
+                sink.commit()
+    sink.commit()
+
+    if failed:
+        print(f"{len(failed)} windows failed; rerun to retry them.")
+
+
+if __name__ == "__main__":
+    cfg = get_config()["backfill"]
+    parser = argparse.ArgumentParser(description="Backfill NYC Open Data history month by month")
+    parser.add_argument("--start", type=str, default=cfg["start"], help="First day to load (YYYY-MM-DD)")
+    parser.add_argument("--end", type=str, help="Day to stop before (YYYY-MM-DD, default today)")
+    parser.add_argument("--workers", type=int, default=cfg["workers"], help="Windows to run in parallel")
+    parser.add_argument("--chunk-size", type=int, help="Process each window this many source rows at a time")
+    parser.add_argument("--offline", action="store_true", help="Read raw extracts from the local cache only")
+    parser.add_argument("--profile", action="store_true", help="Dump a cProfile per stage under the metrics dir")
+    parser.add_argument("--max-rows", type=int, default=cfg["shard_max_rows"], help="Split months into shards of at most this many source rows (0 keeps whole months)")
+    args = parser.parse_args()
+    if args.offline:
+        set_offline()
+    backfill(
+        start=datetime.strptime(args.start, "%Y-%m-%d"),
+        end=datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.today(),
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        profile=args.profile,
+        max_rows=args.max_rows,
+    )
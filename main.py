@@ -1,24 +1,43 @@
 # main.py
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from itertools import zip_longest
 import argparse
 from typing import Optional, Dict
 
 import pandas as pd
 
 from etl.fact_loaders.load_311 import (
+    FACT_SOURCE_COLUMNS as FACT_311_SOURCE_COLUMNS,
+    NORMALIZED_COLUMNS as NORMALIZED_311_COLUMNS,
+    count_311_between,
     get_311_data_between,
-    get_yesterdays_311_data,
+    get_311_updates_since,
+    iter_311_data_between,
     clean_311_data,
-    load_to_bigquery as load_311_fact,
+    load_fact as load_311_fact,
+    merge_fact as merge_311_fact,
 )
 from etl.fact_loaders.load_parking import (
+    FACT_SOURCE_COLUMNS as FACT_PARKING_SOURCE_COLUMNS,
+    count_parking_between,
     get_parking_data_between,
-    get_yesterdays_parking_data,
+    iter_parking_data_between,
     clean_parking_data,
-    load_to_bigquery as load_parking_fact,
+    load_fact as load_parking_fact,
 )
+from etl.core.cache import set_offline
+from etl.core.dim_loader import BaseDimLoader
 from etl.core.key_mapper import assign_keys
-from etl.core.utils import normalize_strings
+from etl.core import metrics
+from etl.core.parallel import map_shards
+from etl.core.partitions import partition_run
+from etl.core.runtime import get_config
+from etl.core.sharding import plan_shards
+from etl.core.sinks import get_sink
+from etl.core.spill import SpillStore
+from etl.core.state import JsonStateStore
+from etl.core.utils import hash_columns, normalize_strings, schema_fingerprint, yesterday_window
 
 from etl.dim_loaders.agency_loader import AgencyDimLoader
 from etl.dim_loaders.complaint_loader import ComplaintDimLoader
@@ -30,24 +49,116 @@ from etl.dim_loaders.date_loader import DateDimLoader
 from etl.dim_loaders.time_loader import TimeDimLoader
 
 
+PARKING_JOIN_COLUMNS = [
+    "plate_id", "registration_state", "plate_type",
+    "violation_code", "violation_description",
+    "house_number", "street_name", "intersecting_street",
+    "violation_county", "violation_precinct",
+]
+AGENCY_KEY_FIELDS = ["agency", "agency_name"]
+COMPLAINT_KEY_FIELDS = ["complaint_type", "descriptor", "location_type"]
+LOCATION_KEY_FIELDS = [
+    "borough", "city", "incident_zip", "street_name",
+    "incident_address", "cross_street_1", "cross_street_2",
+    "intersection_street_1", "intersection_street_2",
+    "latitude", "longitude",
+]
+VEHICLE_KEY_FIELDS = ["plate", "state", "license_type"]
+FACT_311_COLUMNS = [
+    "unique_key",
+    "created_date_key", "created_time_key",
+    "closed_date_key", "closed_time_key",
+    "agency_key", "complaint_key", "location_key",
+    "resolution_action_date", "due_date", "closed_timestamp",
+]
+FACT_PARKING_COLUMNS = [
+    "summons_number",
+    "date_key", "time_key",
+    "violation_code",  # natural key
+    "location_key",    # from clean_parking_data
+    "vehicle_key",
+]
+# fact key column -> the dim it must exist in and the fields it hashes
+# (what assign_keys checks; used when chunks are transformed separately)
+FACT_311_KEY_DIMS = {
+    "agency_key": ("agency", AGENCY_KEY_FIELDS),
+    "complaint_key": ("complaint", COMPLAINT_KEY_FIELDS),
+    "location_key": ("location", LOCATION_KEY_FIELDS),
+}
+FACT_PARKING_KEY_DIMS = {"vehicle_key": ("vehicle", VEHICLE_KEY_FIELDS)}
+FACT_KEY_DIMS = {**FACT_311_KEY_DIMS, **FACT_PARKING_KEY_DIMS}
+FACT_TABLES = {"fact_311": "fact_311_complaints", "fact_parking": "fact_parking_tickets"}
+
+
+def source_columns(fact_columns: list[str], loaders: list[type[BaseDimLoader]]) -> list[str]:
+    """Raw columns to request: what the fact needs plus every dim's extract input."""
+    return list(dict.fromkeys(fact_columns + [c for loader in loaders for c in loader.source_columns]))
+
+
+# projections pushed down into Socrata's $select; keep in step with dim_sources
+SOURCE_COLUMNS_311 = source_columns(
+    FACT_311_SOURCE_COLUMNS, [AgencyDimLoader, ComplaintDimLoader, LocationDimLoader]
+)
+SOURCE_COLUMNS_PARKING = source_columns(
+    FACT_PARKING_SOURCE_COLUMNS, [VehicleDimLoader, ViolationDimLoader, ParkingLocationDimLoader]
+)
+
+
 def load_date_and_time_dims() -> None:
-    # (unchanged)
+    """
+    Keep dim_date and dim_time current without reloading them every run.
+
+    What was loaded is fingerprinted (range + schema) in the state store; a
+    run only appends the dates past the stored horizon, and a table is only
+    rebuilt (WRITE_TRUNCATE) when its fingerprint is missing or has changed.
+    """
+    state = JsonStateStore("static_dims")
+
     date_loader = DateDimLoader()
     start_date = datetime(2010, 1, 1)
     end_date = datetime.today() + timedelta(days=365)
-    df_dates = date_loader.generate_date_range(start_date, end_date)
-    date_loader.load(df_dates)
+    date_schema = schema_fingerprint(date_loader.generate_date_range(start_date, start_date))
+    loaded = state.get(date_loader.table_id)
+    horizon = end_date.date().isoformat()
+    if loaded and loaded["schema"] == date_schema and loaded["start"] == start_date.date().isoformat():
+        if loaded["end"] >= horizon:
+            print(f"{date_loader.table_id} is current through {loaded['end']}")
+            horizon = loaded["end"]
+        else:
+            next_day = datetime.fromisoformat(loaded["end"]) + timedelta(days=1)
+            date_loader.load(date_loader.generate_date_range(next_day, end_date))
+    else:
+        df_dates = date_loader.generate_date_range(start_date, end_date)
+        date_loader.load(df_dates, write_disposition="WRITE_TRUNCATE")
 
     time_loader = TimeDimLoader()
     df_times = time_loader.generate_time_range()
-    time_loader.load(df_times)
+    time_schema = schema_fingerprint(df_times)
+    time_current = state.get(time_loader.table_id) == {"rows": len(df_times), "schema": time_schema}
+    if time_current:
+        print(f"{time_loader.table_id} is current")
+    else:
+        time_loader.load(df_times, write_disposition="WRITE_TRUNCATE")
 
+    # only record what the sink actually accepted
+    get_sink().flush()
+    state.set(date_loader.table_id, {
+        "start": start_date.date().isoformat(),
+        "end": horizon,
+        "schema": date_schema,
+    })
+    if not time_current:
+        state.set(time_loader.table_id, {"rows": len(df_times), "schema": time_schema})
 
-def load_dimensions(
+
+def dim_sources(
     df_311: pd.DataFrame, df_parking: pd.DataFrame
-) -> Dict[str, pd.DataFrame]:
-    loaders = {
-        "agency": (AgencyDimLoader(), pd.concat([df_311, df_parking], ignore_index=True)),
+) -> Dict[str, tuple[BaseDimLoader, pd.DataFrame]]:
+    """Each dimension's loader paired with the raw frame it is built from."""
+    # a chunk can carry only one source, and the agency columns come from 311
+    agency_src = pd.concat([df_311, df_parking], ignore_index=True) if not df_311.empty else df_311
+    return {
+        "agency": (AgencyDimLoader(), agency_src),
         "complaint": (ComplaintDimLoader(), df_311),
         "location": (LocationDimLoader(), df_311),
         "vehicle": (VehicleDimLoader(), df_parking),
@@ -55,137 +166,393 @@ def load_dimensions(
         "parking_location": (ParkingLocationDimLoader(), df_parking),
     }
 
+
+def load_dimensions(
+    df_311: pd.DataFrame, df_parking: pd.DataFrame
+) -> Dict[str, pd.DataFrame]:
     dims: Dict[str, pd.DataFrame] = {}
-    for name, (loader, src) in loaders.items():
+    for name, (loader, src) in dim_sources(df_311, df_parking).items():
         print(f"\nRunning {loader.__class__.__name__}…")
-        ext = loader.extract(src)
+        if src.empty:
+            print(f"No data for {loader.table_id}")
+            continue
+        with metrics.stage("dim_transform", rows_in=len(src), dim=name) as s:
+            ext = loader.extract(src)
+            tf = loader.transform(ext) if not ext.empty else ext
+            s.rows_out = len(tf)
         if ext.empty:
             print(f"No data for {loader.table_id}")
         else:
-            tf = loader.transform(ext)
             loader.load(tf)
             dims[name] = tf
     return dims
 
 
-def main(start: Optional[str] = None, end: Optional[str] = None) -> None:
-    print("Running ETL for NYC Open Data…")
-    load_date_and_time_dims()
+def prepare_311(raw_311: pd.DataFrame) -> pd.DataFrame:
+    """Normalize raw_311's descriptive fields once for the dims and the fact."""
+    return normalize_strings(raw_311, NORMALIZED_311_COLUMNS)
 
-    # 1) Fetch raw slices
-    if start and end:
-        raw_311 = get_311_data_between(start, end)
-        raw_parking = get_parking_data_between(start, end)
-    else:
-        raw_311 = get_yesterdays_311_data()
-        raw_parking = get_yesterdays_parking_data()
-
-    # 2) Normalize joinable fields in raw_parking so dimensions and keys align
-    raw_parking = normalize_strings(
-        raw_parking,
-        [
-            "plate_id", "registration_state", "plate_type",
-            "violation_code", "violation_description",
-            "house_number", "street_name", "intersecting_street",
-            "violation_county", "violation_precinct",
-        ],
-    )
+
+def prepare_parking(raw_parking: pd.DataFrame) -> pd.DataFrame:
+    """Normalize joinable fields in raw_parking so dimensions and keys align."""
+    raw_parking = normalize_strings(raw_parking, PARKING_JOIN_COLUMNS)
     raw_parking["violation_code"] = (
         pd.to_numeric(raw_parking["violation_code"], errors="coerce")
         .astype("Int64")
     )
+    return raw_parking
+
+
+def prepare_window(raw_311: pd.DataFrame, raw_parking: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Normalize joinable fields once, so dimensions and keys align and no later step repeats the work."""
+    if not raw_311.empty:
+        with metrics.stage("prepare", rows_in=len(raw_311), source="311") as s:
+            raw_311 = prepare_311(raw_311)
+            s.rows_out = len(raw_311)
+    if not raw_parking.empty:
+        with metrics.stage("prepare", rows_in=len(raw_parking), source="parking") as s:
+            raw_parking = prepare_parking(raw_parking)
+            s.rows_out = len(raw_parking)
+    return raw_311, raw_parking
+
+
+def transform_chunk(raw_311: pd.DataFrame, raw_parking: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    The part of run_window that works row by row, for one chunk of a window.
+
+    Returns each dim's members by dim name, the keys assign_keys would
+    accept from them by key column, and the facts ("fact_311",
+    "fact_parking") with every key stamped. Combining chunks (dedup of dim
+    members, dropping fact keys with no member) is left to the caller.
+    """
+    raw_311, raw_parking = prepare_window(raw_311, raw_parking)
+    out: Dict[str, pd.DataFrame] = {}
+    for name, (loader, src) in dim_sources(raw_311, raw_parking).items():
+        if src.empty:
+            continue
+        with metrics.stage("dim_transform", rows_in=len(src), dim=name) as s:
+            ext = loader.extract(src)
+            tf = loader.transform(ext) if not ext.empty else ext
+            s.rows_out = len(tf)
+        out[name] = tf
+        for key_name, (dim, fields) in FACT_KEY_DIMS.items():
+            if dim == name and not tf.empty and set(fields) <= set(tf.columns):
+                out[key_name] = pd.DataFrame({key_name: hash_columns(tf, fields)})
+    out["fact_311"] = build_311_fact(raw_311, None)
+    out["fact_parking"] = build_parking_fact(raw_parking, None)
+    return out
+
+
+def _check_keys(fact: pd.DataFrame, shards: list[Dict[str, pd.DataFrame]], key_dims: dict[str, tuple[str, list[str]]]) -> pd.DataFrame:
+    # assign_keys' membership test, against the accepted keys of every shard
+    for key_name in key_dims:
+        accepted = [shard[key_name][key_name] for shard in shards if key_name in shard]
+        if not accepted or key_name not in fact.columns:
+            print(f"Skipping key assignment for {key_name} — missing fields or empty dim_df.")
+            fact[key_name] = pd.NA
+            continue
+        keys = fact[key_name]
+        fact[key_name] = keys.where(keys.isin(pd.concat(accepted).unique()))
+    return fact
+
+
+def run_window_parallel(raw_311: pd.DataFrame, raw_parking: pd.DataFrame, workers: int) -> None:
+    """
+    run_window with transform_chunk run on row shards across a process pool.
+
+    Shard outputs are combined in shard order: each dim keeps the first
+    member per key, and fact keys are checked against every shard's dim, so
+    the tables written match run_window's.
+    """
+    with metrics.stage("transform_parallel", rows_in=len(raw_311) + len(raw_parking), workers=str(workers)):
+        shards = map_shards(transform_chunk, {"raw_311": raw_311, "raw_parking": raw_parking}, workers)
+
+    for name, (loader, _) in dim_sources(pd.DataFrame(), pd.DataFrame()).items():
+        print(f"\nRunning {loader.__class__.__name__}…")
+        parts = [shard[name] for shard in shards if name in shard and not shard[name].empty]
+        if not parts:
+            print(f"No data for {loader.table_id}")
+            continue
+        assert loader.key_column
+        loader.load(pd.concat(parts, ignore_index=True).drop_duplicates(subset=[loader.key_column]))
+
+    for name, key_dims, load in [
+        ("fact_311", FACT_311_KEY_DIMS, load_311_fact),
+        ("fact_parking", FACT_PARKING_KEY_DIMS, load_parking_fact),
+    ]:
+        parts = [shard[name] for shard in shards if not shard[name].empty]
+        if parts:
+            load(_check_keys(pd.concat(parts, ignore_index=True), shards, key_dims))
+
+    with metrics.stage("sink_flush"):
+        get_sink().flush()
+
+
+def run_window(raw_311: pd.DataFrame, raw_parking: pd.DataFrame) -> None:
+    """Transform and load one window (or one chunk of a window) of raw data."""
+    cfg = get_config()["transform"]
+    if cfg["workers"] > 1 and len(raw_311) + len(raw_parking) >= cfg["parallel_min_rows"]:
+        run_window_parallel(raw_311, raw_parking, cfg["workers"])
+        return
+
+    # 2) Normalize joinable fields
+    raw_311, raw_parking = prepare_window(raw_311, raw_parking)
 
     # 3) Load all dims off the full raw sets
     dim_data = load_dimensions(raw_311, raw_parking)
 
-    # ── 311 FACT ────────────────────────────────────────────────────────────────
+    fact_311 = build_311_fact(raw_311, dim_data)
+    if not fact_311.empty:
+        load_311_fact(fact_311)
+
+    fact_parking = build_parking_fact(raw_parking, dim_data)
+    if not fact_parking.empty:
+        load_parking_fact(fact_parking)
+
+    # dim and fact loads for the window may still be in flight
+    with metrics.stage("sink_flush"):
+        get_sink().flush()
+
+
+def _dim(dim_data: Optional[Dict[str, pd.DataFrame]], name: str) -> Optional[pd.DataFrame]:
+    # None: stamp every key and let the caller check membership (out-of-core)
+    return None if dim_data is None else dim_data.get(name, pd.DataFrame())
+
+
+def build_311_fact(raw_311: pd.DataFrame, dim_data: Optional[Dict[str, pd.DataFrame]]) -> pd.DataFrame:
+    """Clean raw 311 rows and stamp their dimension keys."""
     cleaned_311 = clean_311_data(raw_311) if not raw_311.empty else pd.DataFrame()
+    if cleaned_311.empty:
+        return cleaned_311
 
-    if not cleaned_311.empty:
-        # stamp FK columns
-        cleaned_311 = assign_keys(
-            cleaned_311,
-            dim_data["agency"],
-            ["agency", "agency_name"],
-            "agency_key",
-        )
+    # stamp FK columns
+    cleaned_311 = assign_keys(
+        cleaned_311,
+        _dim(dim_data, "agency"),
+        AGENCY_KEY_FIELDS,
+        "agency_key",
+    )
 
-        # guarantee the column exists
-        if "location_type" not in cleaned_311.columns:
-            cleaned_311["location_type"] = ""
-        # turn any NaN into a real string
-
-        cleaned_311["location_type"] = cleaned_311["location_type"].fillna("")
-        cleaned_311 = assign_keys(
-            cleaned_311,
-            dim_data["complaint"],
-            ["complaint_type", "descriptor", "location_type"],
-            "complaint_key",
-        )
-        cleaned_311 = assign_keys(
-            cleaned_311,
-            dim_data["location"],
-            [
-                "borough", "city", "incident_zip", "street_name",
-                "incident_address", "cross_street_1", "cross_street_2",
-                "intersection_street_1", "intersection_street_2",
-                "latitude", "longitude",
-            ],
-            "location_key",
-        )
+    # guarantee the column exists
+    if "location_type" not in cleaned_311.columns:
+        cleaned_311["location_type"] = ""
+    # turn any NaN into a real string
 
-        # slice to your fact schema
-        fact_311_cols = [
-            "unique_key",
-            "created_date_key", "created_time_key",
-            "closed_date_key", "closed_time_key",
-            "agency_key", "complaint_key", "location_key",
-            "resolution_action_date", "due_date", "closed_timestamp",
-        ]
-        fact_311 = cleaned_311[[c for c in fact_311_cols if c in cleaned_311.columns]]
-        load_311_fact(fact_311)
+    cleaned_311["location_type"] = cleaned_311["location_type"].fillna("")
+    cleaned_311 = assign_keys(
+        cleaned_311,
+        _dim(dim_data, "complaint"),
+        COMPLAINT_KEY_FIELDS,
+        "complaint_key",
+    )
+    cleaned_311 = assign_keys(
+        cleaned_311,
+        _dim(dim_data, "location"),
+        LOCATION_KEY_FIELDS,
+        "location_key",
+    )
 
-    # ── PARKING FACT ────────────────────────────────────────────────────────────
+    # slice to your fact schema
+    return cleaned_311[[c for c in FACT_311_COLUMNS if c in cleaned_311.columns]]
+
+
+def build_parking_fact(raw_parking: pd.DataFrame, dim_data: Optional[Dict[str, pd.DataFrame]]) -> pd.DataFrame:
+    """Clean prepared parking rows and stamp their dimension keys."""
     cleaned_parking = clean_parking_data(raw_parking) if not raw_parking.empty else pd.DataFrame()
+    if cleaned_parking.empty:
+        return cleaned_parking
+
+    # rename for VehicleDim natural key
+    cleaned_parking.rename(
+        columns={
+            "plate_id": "plate",
+            "registration_state": "state",
+            "plate_type": "license_type",
+        },
+        inplace=True,
+    )
+
+    # Vehicle FK
+    cleaned_parking = assign_keys(
+        cleaned_parking,
+        _dim(dim_data, "vehicle"),
+        VEHICLE_KEY_FIELDS,
+        "vehicle_key",
+    )
+
+    # slice to your parking fact schema
+    return cleaned_parking[[c for c in FACT_PARKING_COLUMNS if c in cleaned_parking.columns]]
 
-    if not cleaned_parking.empty:
-        # rename for VehicleDim natural key
-        cleaned_parking.rename(
-            columns={
-                "plate_id": "plate",
-                "registration_state": "state",
-                "plate_type": "license_type",
-            },
-            inplace=True,
-        )
 
-        # Vehicle FK
-        cleaned_parking = assign_keys(
-            cleaned_parking,
-            dim_data["vehicle"],
-            ["plate", "state", "license_type"],
-            "vehicle_key",
+def run_incremental_311(since: Optional[str] = None) -> None:
+    """
+    Apply every 311 record changed since the last run to fact_311_complaints.
+
+    The high-water mark is Socrata's :updated_at, kept in the "watermarks"
+    state file and advanced only after the MERGE has gone through. Without a
+    stored watermark (or an explicit since) it starts from yesterday.
+    """
+    state = JsonStateStore("watermarks")
+    watermark = since or state.get("fact_311_complaints") or yesterday_window()[0]
+    raw_311, newest = get_311_updates_since(
+        watermark, get_config()["incremental"]["lookback_minutes"], SOURCE_COLUMNS_311
+    )
+    if raw_311.empty or newest is None:
+        print(f"No 311 changes since {watermark}")
+        return
+
+    raw_311 = prepare_311(raw_311)
+    dim_data = load_dimensions(raw_311, pd.DataFrame())
+    fact_311 = build_311_fact(raw_311, dim_data)
+    if not fact_311.empty:
+        merge_311_fact(fact_311)
+    with metrics.stage("sink_flush"):
+        get_sink().flush()
+
+    if pd.Timestamp(newest.rstrip("Z")) > pd.Timestamp(watermark.rstrip("Z")):
+        state.set("fact_311_complaints", newest)
+        print(f"311 watermark advanced to {newest}")
+
+
+def count_source_rows(start: str, end: str) -> int:
+    """311 requests plus parking tickets in [start, end), for shard planning."""
+    return count_311_between(start, end) + count_parking_between(start, end)
+
+
+def run_range(start: str, end: str, chunk_size: Optional[int] = None, engine: str = "pandas") -> None:
+    """Extract, transform and load [start, end) from both sources."""
+    if engine == "duckdb":
+        run_range_out_of_core(start, end, chunk_size)
+        return
+    if engine != "pandas":
+        raise ValueError(f"Unknown engine {engine!r}")
+
+    # 1) Fetch raw slices, either whole or chunk_size rows at a time so that
+    #    memory stays bounded regardless of how busy the window was. In chunk
+    #    mode each source keeps its next pages downloading in the background
+    #    while the current chunk is transformed and loaded.
+    if chunk_size:
+        chunks = zip_longest(
+            iter_311_data_between(start, end, chunk_size, columns=SOURCE_COLUMNS_311),
+            iter_parking_data_between(start, end, chunk_size, columns=SOURCE_COLUMNS_PARKING),
+            fillvalue=pd.DataFrame(),
         )
+        for raw_311, raw_parking in chunks:
+            with metrics.stage("window", rows_in=len(raw_311) + len(raw_parking)):
+                run_window(raw_311, raw_parking)
+    else:
+        # both downloads are network-bound, so run them side by side
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            fut_311 = pool.submit(get_311_data_between, start, end, columns=SOURCE_COLUMNS_311)
+            fut_parking = pool.submit(get_parking_data_between, start, end, columns=SOURCE_COLUMNS_PARKING)
+            raw_311, raw_parking = fut_311.result(), fut_parking.result()
+        with metrics.stage("window", rows_in=len(raw_311) + len(raw_parking)):
+            run_window(raw_311, raw_parking)
 
-        # slice to your parking fact schema
-        fact_parking_cols = [
-            "summons_number",
-            "date_key", "time_key",
-            "violation_code",  # natural key
-            "location_key",    # from clean_parking_data
-            "vehicle_key",
-        ]
-        fact_parking = cleaned_parking[
-            [c for c in fact_parking_cols if c in cleaned_parking.columns]
-        ]
-        load_parking_fact(fact_parking)
 
-    print("ETL complete!")
+def run_range_out_of_core(start: str, end: str, chunk_size: Optional[int] = None) -> None:
+    """
+    run_range for windows larger than memory.
+
+    Each chunk is prepared, cleaned and keyed as in run_window, then spilled
+    to Parquet instead of loaded. Dimension dedup across the whole window and
+    the fact key checks against the dims run as DuckDB queries over the
+    spill (see SpillStore), and rows are loaded in bounded batches. The
+    tables written are the same as run_window's on the whole window.
+    """
+    chunk_size = chunk_size or get_config()["spill"]["chunk_rows"]
+    chunks = zip_longest(
+        iter_311_data_between(start, end, chunk_size, columns=SOURCE_COLUMNS_311),
+        iter_parking_data_between(start, end, chunk_size, columns=SOURCE_COLUMNS_PARKING),
+        fillvalue=pd.DataFrame(),
+    )
+    loaders = {name: loader for name, (loader, _) in dim_sources(pd.DataFrame(), pd.DataFrame()).items()}
+    table_keys = {**{name: loader.table_key for name, loader in loaders.items()}, **FACT_TABLES}
+    with SpillStore() as spill:
+        for raw_311, raw_parking in chunks:
+            with metrics.stage("spill", rows_in=len(raw_311) + len(raw_parking)):
+                for name, df in transform_chunk(raw_311, raw_parking).items():
+                    spill.append(name, df, table_keys.get(name))
+
+        for name, loader in loaders.items():
+            print(f"\nRunning {loader.__class__.__name__}…")
+            if not spill.has(name):
+                print(f"No data for {loader.table_id}")
+                continue
+            assert loader.key_column
+            for batch in spill.distinct(name, loader.key_column):
+                loader.load(batch)
+        for batch in spill.resolve("fact_311", {k: k for k in FACT_311_KEY_DIMS}):
+            load_311_fact(batch)
+        for batch in spill.resolve("fact_parking", {k: k for k in FACT_PARKING_KEY_DIMS}):
+            load_parking_fact(batch)
+        with metrics.stage("sink_flush"):
+            get_sink().flush()
+
+
+def main(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    load_static_dims: bool = True,
+    incremental: bool = False,
+    since: Optional[str] = None,
+    max_rows: Optional[int] = None,
+    commit: bool = True,
+    engine: Optional[str] = None,
+) -> None:
+    """
+    Run the ETL for [start, end) (yesterday by default).
 
+    commit=False leaves writes a staging sink has accumulated for the caller
+    to commit, so a backfill can load many windows in one job per table.
+    engine defaults to [transform].engine.
+    """
+    print("Running ETL for NYC Open Data…")
+    if load_static_dims:
+        load_date_and_time_dims()
+
+    if not (start and end):
+        start, end = yesterday_window()
+    with partition_run(start, end):
+        if incremental:
+            # 311 rows change after they are created, parking tickets do not:
+            # merge 311 changes by watermark and load parking by window as usual
+            run_incremental_311(since)
+            raw_parking = get_parking_data_between(start, end, columns=SOURCE_COLUMNS_PARKING)
+            with metrics.stage("window", rows_in=len(raw_parking)):
+                run_window(pd.DataFrame(), raw_parking)
+        else:
+            # With max_rows, a busy window is split at midnights into shards
+            # sized by count(*) probes and run one after another.
+            if max_rows:
+                window = (datetime.fromisoformat(start.rstrip("Z")), datetime.fromisoformat(end.rstrip("Z")))
+                shards = plan_shards([window], count_source_rows, max_rows)
+            else:
+                shards = [(start, end)]
+            for shard_start, shard_end in shards:
+                run_range(shard_start, shard_end, chunk_size, engine or get_config()["transform"]["engine"])
+
+    if commit:
+        with metrics.stage("sink_commit"):
+            get_sink().commit()
+    metrics.flush()
+    print("ETL complete!")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run NYC Open Data ETL")
     parser.add_argument("--start", type=str, help="Start timestamp (e.g. 2023-01-01T00:00:00.000)")
     parser.add_argument("--end", type=str, help="End timestamp (e.g. 2023-01-02T00:00:00.000)")
+    parser.add_argument("--chunk-size", type=int, help="Process the window this many source rows at a time")
+    parser.add_argument("--offline", action="store_true", help="Read raw extracts from the local cache only")
+    parser.add_argument("--profile", action="store_true", help="Dump a cProfile per stage under the metrics dir")
+    parser.add_argument("--incremental", action="store_true", help="Merge 311 records changed since the last run instead of loading them by creation window")
+    parser.add_argument("--since", type=str, help="With --incremental, override the stored :updated_at watermark")
+    parser.add_argument("--max-rows", type=int, help="Split the window into shards of at most this many source rows")
+    parser.add_argument("--engine", choices=["pandas", "duckdb"], help="duckdb spills chunks to Parquet for windows larger than memory")
     args = parser.parse_args()
-    main(start=args.start, end=args.end)
+    if args.offline:
+        set_offline()
+    if args.profile:
+        metrics.set_profiling()
+    main(start=args.start, end=args.end, chunk_size=args.chunk_size, incremental=args.incremental, since=args.since, max_rows=args.max_rows, engine=args.engine)
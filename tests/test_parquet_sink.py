@@ -0,0 +1,48 @@
+"""
+ParquetSink partitions only the tables [sink.partition_columns] names.
+"""
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+from etl.core.runtime import get_config
+from etl.core.sinks import ParquetSink
+from etl.dim_loaders.date_loader import DateDimLoader
+
+
+@pytest.fixture
+def sink(tmp_path: Path) -> ParquetSink:
+    return ParquetSink(tmp_path, get_config()["sink"]["partition_columns"])
+
+
+def test_date_dim_is_not_partitioned(sink: ParquetSink, tmp_path: Path) -> None:
+    # one row per day: partitioning on date_key would exceed Arrow's 1024
+    # partitions per write
+    df = DateDimLoader().generate_date_range(datetime(2010, 1, 1), datetime(2027, 12, 31))
+    sink.write("date_dim", df, write_disposition="WRITE_TRUNCATE")
+
+    table_dir = tmp_path / "dim_date"
+    assert not [p for p in table_dir.iterdir() if p.is_dir()]
+    loaded = ds.dataset(table_dir).to_table().to_pandas()
+    assert loaded["date_key"].tolist() == df["date_key"].tolist()
+
+
+def test_fact_table_is_partitioned_by_day(sink: ParquetSink, tmp_path: Path) -> None:
+    df = pd.DataFrame({
+        "summons_number": ["1", "2", "3"],
+        "date_key": pd.array([20240105, 20240105, 20240106], dtype="Int64"),
+    })
+    sink.write("fact_parking_tickets", df)
+    sink.replace("fact_parking_tickets", df.iloc[:1], "date_key", [20240105])
+
+    table_dir = tmp_path / "fact_parking_tickets"
+    assert sorted(p.name for p in table_dir.iterdir()) == ["date_key=20240105", "date_key=20240106"]
+    loaded = ds.dataset(table_dir, partitioning="hive").to_table().to_pandas()
+    assert sorted(loaded["summons_number"]) == ["1", "3"]
+
+
+def test_replace_requires_the_day_partition(sink: ParquetSink) -> None:
+    df = DateDimLoader().generate_date_range(datetime(2024, 1, 1), datetime(2024, 1, 2))
+    with pytest.raises(ValueError, match="not partitioned on date_key"):
+        sink.replace("date_dim", df, "date_key", [20240101])
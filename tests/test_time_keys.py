@@ -0,0 +1,98 @@
+"""
+The vectorized keys in etl.core.time_keys against the per-row strftime and
+parse_violation_time code they replaced.
+"""
+import random
+from datetime import time
+from typing import Any, Optional
+import pandas as pd
+import pytest
+from etl.core.time_keys import date_keys, keys_to_times, parse_violation_times, time_keys
+
+
+def old_date_keys(ts: pd.Series) -> pd.Series:
+    return ts.apply(lambda t: int(t.strftime("%Y%m%d")) if pd.notnull(t) else pd.NA).astype("Int64")
+
+
+def old_time_keys(ts: pd.Series) -> pd.Series:
+    return ts.apply(lambda t: int(t.strftime("%H%M00")) if pd.notnull(t) else pd.NA).astype("Int64")
+
+
+def old_parse_violation_time(s: Any) -> Optional[time]:
+    if pd.isna(s):
+        return None
+    raw = str(s).strip().upper()
+    if not raw or raw[-1] not in {"A", "P"}:
+        return None
+    ampm = raw[-1] + "M"
+    core = raw[:-1]
+    if ":" not in core and len(core) in {3, 4}:
+        core = f"{core[:-2].zfill(2)}:{core[-2:]}"
+    parsed = pd.to_datetime(core + ampm, format="%I:%M%p", errors="coerce")
+    if pd.isna(parsed):
+        return None
+    return parsed.time()
+
+
+def old_violation_times(s: pd.Series) -> tuple[pd.Series, pd.Series]:
+    times = pd.Series([old_parse_violation_time(v) for v in s], index=s.index, dtype=object)
+    keys = times.apply(lambda t: int(t.strftime("%H%M00")) if t else pd.NA).astype("Int64")
+    return times, keys
+
+
+TIMESTAMPS = pd.to_datetime(pd.Series([
+    "2023-01-01 00:00:00", "2023-01-01 00:00:59.999", "2023-06-30 12:34:56",
+    "1999-12-31 23:59:59", "2024-02-29 07:05:00", None, "2013-07-01 12:00:00",
+]), format="ISO8601")
+
+VIOLATION_TIMES = [
+    "0853P", "853P", "0853A", "8:53A", "08:53a", " 0853p ", "8:5A",
+    "1200A", "1200P", "1259A", "1259P", "12:00A", "12:30P", "0000A", "0:30A",
+    "1300P", "0860A", "12:05PM", "0853", "53P", "12345P", "P", "", "  ",
+    "ab:cdP", "08:53X", "8:53:00A", None, float("nan"), pd.NA, 853,
+]
+
+
+@pytest.mark.parametrize("ts", [
+    TIMESTAMPS,
+    pd.to_datetime(pd.Series(["2023-01-01", None])).dt.tz_localize("UTC"),
+    pd.Series([pd.NaT, pd.NaT], dtype="datetime64[ns]"),
+])
+def test_date_and_time_keys_match_strftime(ts: pd.Series) -> None:
+    pd.testing.assert_series_equal(date_keys(ts), old_date_keys(ts), check_names=False)
+    pd.testing.assert_series_equal(time_keys(ts), old_time_keys(ts), check_names=False)
+
+
+def test_keys_of_empty_column() -> None:
+    # the old applies could not turn an empty column into Int64 at all
+    empty = pd.Series([], dtype="datetime64[ns]")
+    assert date_keys(empty).dtype == "Int64" and time_keys(empty).dtype == "Int64"
+
+
+def test_parse_violation_times_matches_parse_violation_time() -> None:
+    s = pd.Series(VIOLATION_TIMES, dtype=object)
+    old_times, old_keys = old_violation_times(s)
+    keys = parse_violation_times(s)
+    pd.testing.assert_series_equal(keys, old_keys, check_names=False)
+    assert keys_to_times(keys).tolist() == old_times.tolist()
+
+
+def test_parse_violation_times_fuzzed() -> None:
+    rng = random.Random(0)
+    alphabet = "0123456789:AaPpMX "
+    values = ["".join(rng.choices(alphabet, k=rng.randint(0, 7))) for _ in range(5000)]
+    # and well-formed times of every shape
+    values += [f"{h}{m:02d}{ap}" for h in range(0, 14) for m in (0, 5, 59, 60) for ap in "AP"]
+    values += [f"{h:02d}:{m}{ap}" for h in range(0, 14) for m in (0, 5, 59, 60) for ap in "AP"]
+    s = pd.Series(values, dtype=object)
+    old_times, old_keys = old_violation_times(s)
+    keys = parse_violation_times(s)
+    pd.testing.assert_series_equal(keys, old_keys, check_names=False)
+    assert keys_to_times(keys).tolist() == old_times.tolist()
+
+
+def test_parse_violation_times_keeps_index() -> None:
+    s = pd.Series(["0853P", None, "0853P"], index=[10, 20, 30])
+    keys = parse_violation_times(s)
+    assert keys.index.tolist() == [10, 20, 30]
+    assert keys.tolist() == [205300, pd.NA, 205300]